@@ -1,8 +1,64 @@
+import asyncio
 import base64
+import hashlib
+import json
+import time
+from contextvars import ContextVar
 import aiohttp
 from multiversx_sdk_core import Address
+import config
 from config import PROXY_URL, SIZE_PER_TYPE
-from TypeParser import ABITypeParser
+from TypeParser import ABITypeParser, build_projection
+from cache import ResultCache
+from store import ResultStore
+from tracing import span
+from decode_pool import DecodePool
+from streaming import ReturnDataParser
+from hedging import Hedger
+from recorder import GatewayRecorder, GatewayReplay
+from scheduler import UpstreamScheduler
+
+BLOCK_OPTIONS = ("blockNonce", "blockHash")
+GATEWAY_RETRIES = getattr(config, "GATEWAY_RETRIES", 1)
+MAX_GATEWAY_RESPONSE_SIZE = getattr(config, "MAX_GATEWAY_RESPONSE_SIZE", 64 * 1024 * 1024)
+CACHE_TTL = getattr(config, "CACHE_TTL", 0)
+LATEST_CACHE = ResultCache(max_entries=getattr(config, "CACHE_SIZE", 10000), ttl=CACHE_TTL)
+# Results queried at a fixed block never change, so they are kept until evicted by size
+HISTORICAL_CACHE = ResultCache(max_entries=getattr(config, "HISTORICAL_CACHE_SIZE", 10000))
+# Set when parse_abi answered from a result cache, the response body is then likely to be sent again
+RESULT_CACHE_HIT: ContextVar = ContextVar("result_cache_hit", default=False)
+# Errors that a retry of the same query would get again, a third item of True in an error tuple marks them
+ERROR_CACHE_TTL = getattr(config, "ERROR_CACHE_TTL", 5)
+ERROR_CACHE = ResultCache(max_entries=getattr(config, "CACHE_SIZE", 10000), ttl=ERROR_CACHE_TTL)
+SHARD_BY_ADDRESS = {}
+RESULT_STORE = None
+PARSERS = {}
+SESSION = None
+SESSION_LOOP = None
+GATEWAY_CONNECTIONS = getattr(config, "GATEWAY_CONNECTIONS", 100)
+# Readonly queries are idempotent, so a slow one can be raced by a duplicate sent to the same or another gateway
+HEDGER = Hedger(
+    [PROXY_URL] + list(getattr(config, "HEDGE_GATEWAYS", [])),
+    getattr(config, "HEDGE_PERCENTILE", 0.95),
+    getattr(config, "HEDGE_MAX_RATIO", 0.05)
+)
+GATEWAY_RECORDER = GatewayRecorder(config.GATEWAY_RECORD_PATH) if getattr(config, "GATEWAY_RECORD_PATH", None) \
+    else None
+GATEWAY_REPLAY = GatewayReplay(
+    config.GATEWAY_REPLAY_PATH,
+    getattr(config, "GATEWAY_REPLAY_MODE", "replay"),
+    getattr(config, "GATEWAY_REPLAY_TIMING", False)
+) if getattr(config, "GATEWAY_REPLAY_PATH", None) else None
+# Gateway queries of all apps share these slots, see scheduler.py
+SCHEDULER = UpstreamScheduler(
+    getattr(config, "UPSTREAM_CONCURRENCY", GATEWAY_CONNECTIONS),
+    getattr(config, "UPSTREAM_APP_CONCURRENCY", 0)
+)
+DECODE_POOL = DecodePool(
+    getattr(config, "DECODE_POOL", "process"),
+    getattr(config, "DECODE_WORKERS", None),
+    getattr(config, "DECODE_OFFLOAD_SIZE", 512 * 1024)
+)
 
 
 def int_to_hex(number):
@@ -14,90 +70,319 @@ def convert_args(args):
     args_output = []
     for arg in args:
         try:
-            if arg["type"].startswith("variadic<"):
-                arg["type"] = arg["type"].replace("variadic<", "")[:-1]
-            if "<" in arg["type"]:
-                arg["type"] = arg["type"].split("<")[1].replace(">", "")
+            arg_type = arg["type"]
+            if arg_type.startswith("variadic<"):
+                arg_type = arg_type.replace("variadic<", "")[:-1]
+            if "<" in arg_type:
+                arg_type = arg_type.split("<")[1].replace(">", "")
             if ',' in arg["value"]:
                 for piece in arg["value"].split(','):
-                    if arg["type"] in list(SIZE_PER_TYPE.keys()):
+                    if arg_type in list(SIZE_PER_TYPE.keys()):
                         args_output.append(int_to_hex(piece))
-                    elif arg["type"] == "Address":
+                    elif arg_type == "Address":
                         args_output.append(Address.from_bech32(piece).hex())
                     else:
                         args_output.append(piece.encode('ascii').hex())
             else:
-                if arg["type"] in list(SIZE_PER_TYPE.keys()):
+                if arg_type in list(SIZE_PER_TYPE.keys()):
                     args_output.append(int_to_hex(arg["value"]))
-                elif arg["type"] == "Address":
+                elif arg_type == "Address":
                     args_output.append(Address.from_bech32(arg["value"]).hex())
                 else:
                     args_output.append(arg["value"].encode('ascii').hex())
-        except:
-            pass
+        except Exception as e:
+            if str(arg.get("value", "")) == "":
+                # Omitted optional arguments are left out
+                continue
+            return 400, f"Invalid value '{arg['value']}' for argument of type {arg['type']}: {e}", True
     return args_output
 
 
 def decode_return_data(data):
     if data is None:
         return None
-    result = []
-    for item in data:
-        result.append(bytes.fromhex(base64.b64decode(item).hex()))
-    return result
+    return [base64.b64decode(item) for item in data]
+
+
+def open_result_store(path, max_bytes):
+    # Fill the in-memory caches from disk so the first requests after a restart are served locally
+    global RESULT_STORE
+    RESULT_STORE = ResultStore(path, max_bytes=max_bytes)
+    RESULT_STORE.compact()
+    loaded = 0
+    for key, value, ttl in RESULT_STORE.load():
+        if len(key) < 5 or not isinstance(key[4], str):
+            # Stored before keys held the ABI version, they can never be hit
+            continue
+        if key[3]:
+            HISTORICAL_CACHE.set(key, value)
+        elif CACHE_TTL > 0:
+            LATEST_CACHE.set(key, value, ttl)
+        else:
+            continue
+        loaded += 1
+    return loaded
+
+
+def close_result_store():
+    if RESULT_STORE is not None:
+        RESULT_STORE.close()
+
+
+def get_session():
+    # One pooled session per event loop, so gateway connections are reused across requests
+    global SESSION, SESSION_LOOP
+    loop = asyncio.get_running_loop()
+    if SESSION is None or SESSION.closed or SESSION_LOOP is not loop:
+        SESSION = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=GATEWAY_CONNECTIONS))
+        SESSION_LOOP = loop
+    return SESSION
+
+
+async def close_session():
+    if SESSION is not None and not SESSION.closed:
+        await SESSION.close()
+
+
+def remember_result(cache_key, parsed_data, block=None):
+    if block or CACHE_TTL > 0:
+        (HISTORICAL_CACHE if block else LATEST_CACHE).set(cache_key, parsed_data)
+        if RESULT_STORE is not None:
+            RESULT_STORE.put(cache_key, parsed_data, None if block else CACHE_TTL)
+
+
+def parser_entry(abi_json):
+    entry = PARSERS.get(id(abi_json))
+    if entry is None or entry[0] is not abi_json:
+        version = hashlib.sha256(json.dumps(abi_json, sort_keys=True).encode()).hexdigest()[:16]
+        entry = PARSERS[id(abi_json)] = (abi_json, ABITypeParser(abi_json), version)
+    return entry
+
 
+def get_parser(abi_json):
+    return parser_entry(abi_json)[1]
 
-async def query_sc(endpoint, sc_address, args=None):
+
+def abi_version(abi_json):
+    # Part of every result cache key, so results decoded with another (or an older) ABI are never served
+    return parser_entry(abi_json)[2]
+
+
+def release_parser(abi_json):
+    entry = PARSERS.get(id(abi_json))
+    if entry is not None and entry[0] is abi_json:
+        del PARSERS[id(abi_json)]
+
+
+def make_cache_key(sc_address, func, args, block=None, fields=None, decode=True, version=""):
+    key = (
+        sc_address,
+        func,
+        tuple((arg["type"], str(arg["value"])) for arg in args),
+        tuple(sorted((block or {}).items())),
+        version
+    )
+    if fields:
+        key += (("fields", ",".join(sorted(path.strip() for path in fields.split(",")))),)
+    if not decode:
+        key += (("raw",),)
+    return key
+
+
+async def gateway_get(path):
+    # Shard and network status lookups are recorded and replayed like the queries. Replaying the recorded
+    # nonces keeps the block parameters of the queries that follow them equal to the recorded ones.
+    body = {"GET": path}
+    if GATEWAY_REPLAY is not None and GATEWAY_REPLAY.mode == "replay":
+        answer = await GATEWAY_REPLAY.answer(body, None)
+        if answer is None:
+            raise RuntimeError(f"No recorded gateway response for {path}")
+        return answer
+    started = time.perf_counter()
+    try:
+        async with get_session().get(f"{PROXY_URL}{path}") as response:
+            answer = await response.json()
+    except Exception:
+        replayed = await GATEWAY_REPLAY.answer(body, None, successful=True) if GATEWAY_REPLAY is not None else None
+        if replayed is None:
+            raise
+        print(f"Gateway failed, serving recorded response for {path}")
+        return replayed
+    if GATEWAY_RECORDER is not None:
+        GATEWAY_RECORDER.record(body, None, answer, time.perf_counter() - started)
+    return answer
+
+
+async def get_address_shard(sc_address):
+    if sc_address not in SHARD_BY_ADDRESS:
+        response_json = await gateway_get(f"/address/{sc_address}/shard")
+        SHARD_BY_ADDRESS[sc_address] = response_json["data"]["shardID"]
+    return SHARD_BY_ADDRESS[sc_address]
+
+
+async def resolve_block_nonces(sc_addresses):
+    # Latest final nonce of every shard holding one of the given contracts
+    nonces = {}
+    try:
+        for sc_address in sc_addresses:
+            shard = await get_address_shard(sc_address)
+            if shard not in nonces:
+                response_json = await gateway_get(f"/network/status/{shard}")
+                nonces[shard] = response_json["data"]["status"]["erd_highest_final_nonce"]
+    except Exception as e:
+        return 500, f"Failed to resolve block nonce from gateway: {e}"
+    return {sc_address: nonces[SHARD_BY_ADDRESS[sc_address]] for sc_address in sc_addresses}
+
+
+async def read_gateway_json(response):
+    # returnData items are collected as they stream in, without buffering the whole body
+    if response.content_length and response.content_length > MAX_GATEWAY_RESPONSE_SIZE:
+        return 502, f"Gateway response exceeds {MAX_GATEWAY_RESPONSE_SIZE} bytes"
+    parser = ReturnDataParser()
+    size = 0
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        size += len(chunk)
+        if size > MAX_GATEWAY_RESPONSE_SIZE:
+            return 502, f"Gateway response exceeds {MAX_GATEWAY_RESPONSE_SIZE} bytes"
+        parser.feed(chunk)
+    try:
+        return parser.result()
+    except:
+        return 500, "Failed to load JSON response from gateway"
+
+
+async def post_query(url, body, block=None):
+    try:
+        session = get_session()
+        async with session.post(url, json=body, params=block or None,
+                                headers={"Accept-Encoding": "gzip, deflate"}) as response:
+            response_json = await read_gateway_json(response)
+            if isinstance(response_json, tuple):
+                return response_json
+            if response.status != 200:
+                return response.status, response_json["error"]
+            try:
+                if response_json["data"]["data"]["returnCode"] != "ok":
+                    return 400, response_json["data"]["data"]["returnMessage"], True
+            except:
+                if response_json['error'] != "":
+                    return 500, response_json['error']
+
+            return response_json["data"]["data"]["returnData"]
+    except asyncio.CancelledError:
+        # The losing request of a hedged pair
+        raise
+    except:
+        return 500, "Request timed out"
+
+
+async def gateway_query(endpoint, body, block=None):
+    if GATEWAY_REPLAY is not None and GATEWAY_REPLAY.mode == "replay":
+        answer = await GATEWAY_REPLAY.answer(body, block)
+        return answer if answer is not None else (503, f"No recorded gateway response for {endpoint}")
+    async with SCHEDULER.slot():
+        started = time.perf_counter()
+        # The hedge needs a slot of its own, so the scheduler's limits count every request sent
+        answer = await HEDGER.run(endpoint, lambda gateway: post_query(f"{gateway}/vm-values/query", body, block),
+                                  SCHEDULER.try_slot)
+    if GATEWAY_RECORDER is not None:
+        GATEWAY_RECORDER.record(body, block, answer, time.perf_counter() - started)
+    if GATEWAY_REPLAY is not None and isinstance(answer, tuple) and answer[0] >= 500:
+        replayed = await GATEWAY_REPLAY.answer(body, block, successful=True)
+        if replayed is not None:
+            print(f"Gateway failed ({answer[1]}), serving recorded response for {endpoint}")
+            return replayed
+    return answer
+
+
+async def query_sc(endpoint, sc_address, args=None, block=None):
     if args is None:
         args = []
     else:
-        args = convert_args(args)
+        with span("encode"):
+            args = convert_args(args)
         if isinstance(args, tuple):
-            return args[0], args[1]
-    url = f"{PROXY_URL}/vm-values/query"
+            return args
     body = {
         "scAddress": sc_address,
         "funcName": endpoint,
         "value": "0",
         "args": args
     }
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=body) as response:
-                try:
-                    response_json = await response.json()
-                except:
-                    return 500, "Failed to load JSON response from gateway"
-                if response.status != 200:
-                    return response.status, response_json["error"]
-                try:
-                    if response_json["data"]["data"]["returnCode"] != "ok":
-                        return 400, response_json["data"]["data"]["returnMessage"]
-                except:
-                    if response_json['error'] != "":
-                        if response_json == "'executeQuery: executeQuery: execution failed with timeout'":
-                            print(f"Trying again: {response_json['error']}")
-                            await query_sc(endpoint, sc_address, args)
-
-                return response_json["data"]["data"]["returnData"]
-    except:
-        return 500, "Request timed out"
+    with span("gateway", endpoint=endpoint):
+        for attempt in range(GATEWAY_RETRIES + 1):
+            with span("gateway.attempt", attempt=attempt):
+                answer = await gateway_query(endpoint, body, block)
+            if isinstance(answer, tuple) and answer[0] != 400 and "timeout" in str(answer[1]).lower() \
+                    and attempt < GATEWAY_RETRIES:
+                print(f"Trying again: {answer[1]}")
+                continue
+            return answer
+
+
+async def fan_out_query(sc_addresses, func, endpoints, abi_json, args=None, block=None, limit=16, fields=None,
+                        decode=True):
+    semaphore = asyncio.Semaphore(limit)
 
+    async def query_address(sc_address):
+        async with semaphore:
+            return await parse_abi(sc_address, func, endpoints, abi_json, args, block, fields, decode)
 
-async def parse_abi(sc_address, func, endpoints, abi_json, args=None):
+    outputs = await asyncio.gather(*(query_address(sc_address) for sc_address in sc_addresses))
+    results = {}
+    for sc_address, (code, output) in zip(sc_addresses, outputs):
+        results[sc_address] = output if code == 200 else {"error": output, "code": code}
+    return results
+
+
+async def parse_abi(sc_address, func, endpoints, abi_json, args=None, block=None, fields=None, decode=True):
     if args is None:
         args = []
     endpoint_data = next((d for d in endpoints if d['name'] == func), None)
     if endpoint_data is None:
         return None
-    answer = await query_sc(func, sc_address, args=args)
+    cache = HISTORICAL_CACHE if block else LATEST_CACHE
+    cache_key = make_cache_key(sc_address, func, args, block, fields, decode, abi_version(abi_json))
+    if block or CACHE_TTL > 0:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            RESULT_CACHE_HIT.set(True)
+            return 200, cached
+    if ERROR_CACHE_TTL > 0:
+        cached_error = ERROR_CACHE.get(cache_key)
+        if cached_error is not None:
+            return 400, cached_error
+    answer = await query_sc(func, sc_address, args=args, block=block)
     if isinstance(answer, tuple):
+        if ERROR_CACHE_TTL > 0 and len(answer) > 2 and answer[2]:
+            # Timeouts and gateway failures are never cached, only contract and argument errors
+            ERROR_CACHE.set(cache_key, answer[1])
         return 400, answer[1]
-    decoded_answer = decode_return_data(answer)
-    abi_type_parser = ABITypeParser(abi_json)
+    if not decode:
+        # Gateway returnData passed through untouched for clients decoding it themselves
+        parsed_data = answer or []
+        remember_result(cache_key, parsed_data, block)
+        return 200, parsed_data
     response_type = endpoint_data["outputs"][0]["type"]
-    try:
-        parsed_data = abi_type_parser.parse_hex_response(decoded_answer, response_type)
+    projection = build_projection(fields) if fields else None
+    if DECODE_POOL.should_offload(answer):
+        # Large payloads are decoded off the event loop so they don't stall other requests
+        try:
+            with span("abi_decode", type=response_type, offloaded=True):
+                parsed_data = await DECODE_POOL.decode(abi_json, answer, response_type, projection)
+        except Exception as e:
+            return 500, str(e)
+        remember_result(cache_key, parsed_data, block)
         return 200, parsed_data
+    with span("b64decode"):
+        decoded_answer = decode_return_data(answer)
+    # Only the decoded copy is needed from here on
+    answer = None
+    abi_type_parser = get_parser(abi_json)
+    try:
+        with span("abi_decode", type=response_type):
+            parsed_data = abi_type_parser.parse_hex_response(decoded_answer, response_type, projection)
     except Exception as e:
         return 500, str(e)
+    remember_result(cache_key, parsed_data, block)
+    return 200, parsed_data
@@ -4,6 +4,26 @@ import base64
 import json
 
 
+FIXED_SIZES = {"u8": 1, "i8": 1, "usize": 1, "isize": 1, "u16": 2, "i16": 2, "u32": 4, "i32": 4, "u64": 8, "i64": 8,
+               "bool": 1, "H256": 32, "Address": 32}
+
+
+def build_projection(paths: str) -> Optional[Dict[str, Any]]:
+    # "items.owner,price" -> {"items": {"owner": None}, "price": None}, None meaning the whole value
+    projection: Dict[str, Any] = {}
+    for path in sorted(path.strip() for path in paths.split(",") if path.strip()):
+        node = projection
+        parts = path.split(".")
+        for i, part in enumerate(parts):
+            if part in node and node[part] is None:
+                break
+            if i == len(parts) - 1:
+                node[part] = None
+            else:
+                node = node.setdefault(part, {})
+    return projection or None
+
+
 class ABITypeParser:
     def __init__(self, abi_json: Dict[str, Any]) -> None:
         self.types: Dict[str, Any] = {}
@@ -15,7 +35,7 @@ class ABITypeParser:
     def chunks(self, listitems, n):
         return [listitems[i:i + n] for i in range(0, len(listitems), n)]
 
-    def parse_hex_response(self, hex_responses: list, response_type: str) -> Any:
+    def parse_hex_response(self, hex_responses: list, response_type: str, projection: Optional[Dict[str, Any]] = None) -> Any:
         result = []
         originalispremitive = False
 
@@ -44,7 +64,7 @@ class ABITypeParser:
                 result.append(tuple(output))
             return result
         for hex_response in hex_responses:
-            parsed_data, _ = self.read_hex(hex_response, response_type, originalispremitive)
+            parsed_data, _ = self.read_hex(hex_response, response_type, originalispremitive, projection)
             result.append(parsed_data)
         if len(result) == 1:
             return result[0]
@@ -63,7 +83,8 @@ class ABITypeParser:
         except Exception:
             return False
 
-    def read_hex(self, data: bytes, object_type: str, originaltypeispremitive=False) -> Tuple[Any, int]:
+    def read_hex(self, data: bytes, object_type: str, originaltypeispremitive=False,
+                 projection: Optional[Dict[str, Any]] = None) -> Tuple[Any, int]:
         if originaltypeispremitive and len(data) == 0 and object_type in ["u8", "i8", "u16", "i16", "u32", "i32", "u64",
                                                                           "i64", "bool", "BigUint", "BigInt", "isize",
                                                                           "usize"]:
@@ -74,7 +95,7 @@ class ABITypeParser:
             return None, 0
         if object_type.startswith("optional<"):
             subtype = object_type.replace("optional<", "")[:-1]
-            return self.read_hex(data, subtype)
+            return self.read_hex(data, subtype, projection=projection)
         elif object_type in ["u8", "i8", "u16", "i16", "u32", "i32", "u64", "i64", "bool", "TokenIdentifier",
                              "EgldOrEsdtTokenIdentifier", "BigUint", "BigInt", "bytes", "isize", "usize", "H256"]:
             return self.read_primitive_type(data, object_type, originaltypeispremitive)
@@ -82,18 +103,18 @@ class ABITypeParser:
             return self.read_address_type(data)
         elif object_type.startswith("List<"):
             subtype = object_type.replace("List<", "")[:-1]
-            return self.read_list_type(data, subtype)
+            return self.read_list_type(data, subtype, projection)
         elif object_type.startswith("array") and '<' in object_type:
-            return self.read_array_type(data, object_type)
+            return self.read_array_type(data, object_type, projection)
         elif object_type.startswith("vec<") or object_type.startswith("Vec<"):
             subtype = object_type[4:-1]
-            return self.read_list_type(data, subtype)
+            return self.read_list_type(data, subtype, projection)
         elif object_type.startswith("variadic<"):
             subtype = object_type.replace("variadic<", "")[:-1]
-            return self.read_hex(data, subtype, originaltypeispremitive)
+            return self.read_hex(data, subtype, originaltypeispremitive, projection)
         elif object_type.startswith("Option<"):
             subtype = object_type.replace("Option<", "")[:-1]
-            return self.read_option_type(data, subtype)
+            return self.read_option_type(data, subtype, projection)
         elif object_type.startswith("multi<"):
             subtypes = object_type.replace("multi<", "")[:-1].split(",")
             return self.read_multi_type(data, subtypes)
@@ -112,11 +133,16 @@ class ABITypeParser:
                     field_name = field["name"]
                     field_type = field["type"]
 
+                    if projection is not None and field_name not in projection:
+                        # Unrequested fields are only measured so the following fields can be found
+                        offset += self.skip_field(data[offset:], field_type)
+                        continue
+                    field_projection = projection.get(field_name) if projection is not None else None
                     if field_type.startswith("List<"):
                         subtype = field_type.replace("List<", "")[:-1]
-                        parsed_field, field_length = self.read_sub_list_type(data[offset:], subtype)
+                        parsed_field, field_length = self.read_sub_list_type(data[offset:], subtype, field_projection)
                     else:
-                        parsed_field, field_length = self.read_hex(data[offset:], field_type)
+                        parsed_field, field_length = self.read_hex(data[offset:], field_type, projection=field_projection)
                     parsed_object[field_name] = parsed_field
                     offset += field_length
                 return parsed_object, offset
@@ -132,6 +158,71 @@ class ABITypeParser:
         else:
             raise ValueError(f"Unsupported type: {object_type}")
 
+    def skip_field(self, data: bytes, field_type: str) -> int:
+        if field_type.startswith("List<"):
+            return self.skip_sub_list(data, field_type.replace("List<", "")[:-1])
+        return self.skip_hex(data, field_type)
+
+    def skip_sub_list(self, data: bytes, subtype: str) -> int:
+        list_length = int.from_bytes(data[:4], byteorder='big')
+        offset = 4
+        for _ in range(list_length):
+            offset += self.skip_hex(data[offset:], subtype)
+        return offset
+
+    def skip_hex(self, data: bytes, object_type: str) -> int:
+        # Length of the nested encoding of object_type at the start of data, mirroring read_hex without decoding
+        if len(data) == 0:
+            return 0
+        if object_type in FIXED_SIZES:
+            return FIXED_SIZES[object_type]
+        if object_type in ["TokenIdentifier", "EgldOrEsdtTokenIdentifier", "BigUint", "BigInt", "bytes"]:
+            return 4 + int.from_bytes(data[:4], byteorder="big")
+        if object_type.startswith("optional<"):
+            return self.skip_hex(data, object_type.replace("optional<", "")[:-1])
+        if object_type.startswith("variadic<"):
+            return self.skip_hex(data, object_type.replace("variadic<", "")[:-1])
+        if object_type.startswith(("List<", "vec<", "Vec<")):
+            # Lists outside of struct fields consume the rest of the data, as in read_list_type
+            return len(data)
+        if object_type.startswith("array") and '<' in object_type:
+            list_length = int(object_type.split('<')[0].replace("array", ""))
+            subtype = object_type.split('<')[1][:-1]
+            offset = 0
+            for _ in range(list_length):
+                offset += self.skip_hex(data[offset:], subtype)
+            return offset
+        if object_type.startswith("Option<"):
+            if data[0] == 0:
+                return 1
+            return 1 + self.skip_hex(data[1:], object_type.replace("Option<", "")[:-1])
+        if object_type.startswith(("multi<", "tuple<")):
+            subtypes = object_type[object_type.index("<") + 1:-1].split(",")
+            offset = 0
+            for subtype in subtypes:
+                offset += self.skip_field(data[offset:], subtype)
+            return offset
+        if object_type in self.types:
+            type_fields = self.types[object_type]
+            if isinstance(type_fields, dict) and type_fields.get("type") == "enum":
+                variant = type_fields.get("variants", [])[data[0]]
+                offset = 1
+                for field in variant.get("fields", []):
+                    offset += self.skip_hex(data[offset:], field["type"])
+                return offset
+            if isinstance(type_fields, dict) and type_fields.get("type") == "struct":
+                offset = 0
+                for field in type_fields["fields"]:
+                    offset += self.skip_field(data[offset:], field["type"])
+                return offset
+            if isinstance(type_fields, list):
+                offset = 0
+                for field_type in type_fields:
+                    offset += self.skip_hex(data[offset:], field_type)
+                return offset
+        # Anything else is decoded to learn its length
+        return self.read_hex(data, object_type)[1]
+
     def read_multi_type(self, data: bytes, subtypes: List[str]) -> Tuple[Tuple[Any, ...], int]:
         parsed_items = []
         offset = 0
@@ -232,44 +323,48 @@ class ABITypeParser:
         item_length = 32
         return parsed_item, item_length
 
-    def read_list_type(self, data: bytes, subtype: str) -> Tuple[List[Any], int]:
+    def read_list_type(self, data: bytes, subtype: str,
+                       projection: Optional[Dict[str, Any]] = None) -> Tuple[List[Any], int]:
         parsed_list = []
         offset = 0
         while offset < len(data):
-            parsed_item, item_length = self.read_hex(data[offset:], subtype)
+            parsed_item, item_length = self.read_hex(data[offset:], subtype, projection=projection)
             parsed_list.append(parsed_item)
             offset += item_length
         return parsed_list, offset
 
-    def read_sub_list_type(self, data: bytes, subtype: str) -> Tuple[List[Any], int]:
+    def read_sub_list_type(self, data: bytes, subtype: str,
+                           projection: Optional[Dict[str, Any]] = None) -> Tuple[List[Any], int]:
         parsed_list = []
         list_length = int.from_bytes(data[:4], byteorder='big')
         offset = 4
         for list_item in range(list_length):
-            parsed_item, item_length = self.read_hex(data[offset:], subtype)
+            parsed_item, item_length = self.read_hex(data[offset:], subtype, projection=projection)
             parsed_list.append(parsed_item)
             offset += item_length
         return parsed_list, offset
 
-    def read_array_type(self, data: bytes, subtype: str) -> Tuple[List[Any], int]:
+    def read_array_type(self, data: bytes, subtype: str,
+                        projection: Optional[Dict[str, Any]] = None) -> Tuple[List[Any], int]:
         parsed_list = []
         if subtype.startswith("array") and "<" in subtype:
             list_length = int(subtype.split('<')[0].replace("array", ""))
             subtype = subtype.split('<')[1][:-1]
             offset = 0
             for list_item in range(list_length):
-                parsed_item, item_length = self.read_hex(data[offset:], subtype)
+                parsed_item, item_length = self.read_hex(data[offset:], subtype, projection=projection)
                 parsed_list.append(parsed_item)
                 offset += item_length
             return parsed_list, offset
 
-    def read_option_type(self, data: bytes, subtype: str) -> Tuple[Optional[Any], int]:
+    def read_option_type(self, data: bytes, subtype: str,
+                         projection: Optional[Dict[str, Any]] = None) -> Tuple[Optional[Any], int]:
         if len(data) == 0:
             return None, 0
         presence_flag = data[0]
         offset = 1
         if presence_flag == 0:
             return None, offset
-        parsed_item, item_length = self.read_hex(data[offset:], subtype)
+        parsed_item, item_length = self.read_hex(data[offset:], subtype, projection=projection)
         offset += item_length
         return parsed_item, offset
@@ -0,0 +1,71 @@
+import hmac
+from quart import Blueprint, Response, jsonify, request
+import config
+from profiling import profile_loop, render_profile, memory_diff, profiling_busy
+
+ADMIN_TOKEN = getattr(config, "ADMIN_TOKEN", None)
+MAX_PROFILE_SECONDS = 120
+
+
+def is_admin(request):
+    if not ADMIN_TOKEN:
+        return False
+    token = request.headers.get("X-Admin-Token", "")
+    if not token and request.headers.get("Authorization", "").startswith("Bearer "):
+        token = request.headers["Authorization"][7:]
+    # Bytes, compare_digest rejects str with non-ASCII characters
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def error_response(code, message):
+    response = jsonify({"error": message})
+    response.status_code = code
+    return response
+
+
+def admin_denied():
+    # Admin routes don't exist as far as unauthenticated clients can tell
+    return error_response(404, "Not found")
+
+
+def profiling_conflict():
+    return error_response(409, "Another profiling session is running")
+
+
+def get_seconds():
+    try:
+        seconds = float(request.args.get("seconds", 10))
+    except ValueError:
+        seconds = 10
+    return min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+
+
+def create_admin_blueprint():
+    bp = Blueprint("admin", __name__)
+
+    @bp.before_request
+    async def check_admin():
+        if not is_admin(request):
+            return admin_denied()
+
+    @bp.route('/admin/profile')
+    async def profile():
+        # Profiles everything the event loop runs for the given number of seconds
+        mode = request.args.get("mode", "sample")
+        if mode not in ("sample", "cprofile"):
+            return error_response(400, "mode must be 'sample' or 'cprofile'")
+        if profiling_busy():
+            return profiling_conflict()
+        profiler = await profile_loop(get_seconds(), mode)
+        body, mimetype = render_profile(profiler, request.args.get("output", "text"))
+        return Response(body, mimetype=mimetype)
+
+    @bp.route('/admin/memory')
+    async def memory():
+        limit = int(request.args.get("limit", 30)) if request.args.get("limit", "").isdigit() else 30
+        group_by = "traceback" if request.args.get("group_by") == "traceback" else "lineno"
+        if profiling_busy():
+            return profiling_conflict()
+        return Response(await memory_diff(get_seconds(), limit, group_by), mimetype="text/plain")
+
+    return bp
@@ -1,225 +1,333 @@
-from quart import Quart, jsonify, request, Blueprint
-from quart.views import View
-from marshmallow import Schema, fields, EXCLUDE
+from quart import Quart, jsonify, request, Blueprint, Response, g
+import asyncio
+import hashlib
 import json
 import re
-import uvicorn
-import requests
-from dark_theme_css import CSS
+import sys
+import zlib
+import config
 from config import APIS, PORT
-from ParseABI import parse_abi
+from ParseABI import parse_abi, fan_out_query, resolve_block_nonces, open_result_store, close_result_store, BLOCK_OPTIONS, \
+    DECODE_POOL, close_session, GATEWAY_RECORDER, release_parser, SCHEDULER, RESULT_CACHE_HIT
+from ratelimit import RateLimiter, InFlightLimiter, client_key
+from tracing import request_trace, span, close_trace_writer, SERVER_TIMING
+from admin import create_admin_blueprint, is_admin, admin_denied, error_response, profiling_conflict
+from profiling import profile_call, render_profile, profiling_busy
+from build import read_artifact, code_version
+from compression import ResponseCompressor, negotiate
+from quart.wrappers.response import DataBody
+from loop_monitor import LoopMonitor, track_request
+import metrics
+from assets import ASSETS, ASSETS_URL_PATH, docs_page, load_assets
+from warmup import start_warm_up, stop_warm_up, WARMUP_STATE
+from registry import ABIRegistry, AppConfig, AppMeta, intern_abi
+from export import EXPORT_FORMATS, export_lines, iter_jobs, run_export
+from history import HistoryStore, HistoryPoller, series_key
+from scheduler import set_upstream_context
+from formats import get_output_format, encode_return_data, BINARY_SERIALIZERS, MIMETYPES, UNDECODED_FORMATS
 
 CONFIG_DICT = {}
+HISTORY_STORE = None
+MAX_HISTORY_POINTS = 10000
+RATE_LIMITER = RateLimiter(getattr(config, "RATE_LIMIT", None))
+IN_FLIGHT_LIMITER = InFlightLimiter(getattr(config, "MAX_IN_FLIGHT", 0))
+API_KEYS = frozenset(getattr(config, "API_KEYS", None) or ())
+BUILD_DIR = getattr(config, "BUILD_DIR", "build")
+ADDRESS_GROUPS = getattr(config, "ADDRESS_GROUPS", {})
+FANOUT_CONCURRENCY = getattr(config, "FANOUT_CONCURRENCY", 16)
+MAX_FANOUT_ADDRESSES = getattr(config, "MAX_FANOUT_ADDRESSES", 1000)
+MAX_BATCH_QUERIES = getattr(config, "MAX_BATCH_QUERIES", 100)
+MAX_EXPORT_ARGS = getattr(config, "MAX_EXPORT_ARGS", 1000)
+APP_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+# First path segments used by other routes
+RESERVED_APP_NAMES = ("admin", "api", "assets")
+# Second path segments used by the app routes, a readonly endpoint with one of these names would be unreachable
+RESERVED_ENDPOINT_NAMES = ("batch", "export")
+# Routes counted by the rate limiter, with the endpoint name used for ENDPOINT_RATE_LIMITS
+RATE_LIMITED_ROUTES = {
+    "apps.endpoint_query": None,
+    "apps.batch_query": "batch",
+    "apps.export_view": "export"
+}
+COMPRESSOR = ResponseCompressor(
+    getattr(config, "COMPRESSION_MIN_SIZE", 1024),
+    getattr(config, "COMPRESSION_OFFLOAD_SIZE", 256 * 1024),
+    getattr(config, "COMPRESSION_CACHE_SIZE", 1000),
+    getattr(config, "COMPRESSION_CACHE_BYTES", 64 * 1024 * 1024)
+)
+
+
+BASIC_OUTPUT_TYPES = {
+    'i8': {'type': 'integer', 'example': 1},
+    'i16': {'type': 'integer', 'example': 12},
+    'i32': {'type': 'integer', 'example': 1234},
+    'i64': {'type': 'integer', 'example': 12345678},
+    'u8': {'type': 'integer', 'example': 1},
+    'u16': {'type': 'integer', 'example': 12},
+    'u32': {'type': 'integer', 'example': 1234},
+    'u64': {'type': 'integer', 'example': 12345678},
+    'isize': {'type': 'integer', 'example': 1},
+    'usize': {'type': 'integer', 'example': 1},
+    'bytes': {'type': 'string', 'example': 'When the time of the White Frost comes, do not eat the yellow snow!'},
+    'bool': {'type': 'boolean', 'example': False},
+    'BigUint': {'type': 'string', 'example': '69000000000000000000'},
+    'BigInt': {'type': 'string', 'example': '69000000000000000000'},
+    'EgldOrEsdtTokenIdentifier': {'type': 'string', 'example': 'EGLD'},
+    'TokenIdentifier': {'type': 'string', 'example': 'ELLAMA-6c0295'},
+    'Address': {'type': 'string', 'example': 'erd1ccxmfaganejartfyr9ack4lnudxam8ezzwn23k3x5nls97rjaeds7f2wu2'}
+}
+ARRAY_OUTPUT_TYPES = ('variadic<', 'List<', 'vec<', 'multi<')
+
+
+class OutputSchemas:
+    # Swagger schemas of one ABI's output types. Every custom type is emitted once under `definitions` and
+    # referenced with $ref, and every type string is resolved once, so nested and reused structs stay linear.
+    # Examples are only set up to the first $ref, Swagger UI builds the rest from the referenced definitions.
+    def __init__(self, types):
+        self.types = types
+        self.definitions = {}
+        self.schemas = {}
+
+    def resolve(self, output_type):
+        if isinstance(output_type, list):
+            output_type = output_type[0]
+        if not isinstance(output_type, str):
+            # Already resolved
+            return output_type
+        if output_type not in self.schemas:
+            self.schemas[output_type] = self.build_schema(output_type)
+        return self.schemas[output_type]
+
+    def build_schema(self, output_type):
+        if output_type in BASIC_OUTPUT_TYPES:
+            return BASIC_OUTPUT_TYPES[output_type]
+        if output_type.startswith(('optional<', 'Option<')):
+            subtype = self.resolve(output_type[output_type.index('<') + 1:-1])
+            if '$ref' in subtype:
+                return dict(subtype, **{'x-nullable': True})
+            return dict(subtype, nullable=True)
+        if output_type.startswith(ARRAY_OUTPUT_TYPES):
+            items = self.resolve(output_type[output_type.index('<') + 1:-1])
+            schema = {'type': 'array', 'items': items}
+            if 'example' in items:
+                schema['example'] = [items['example']]
+            return schema
+        if output_type == 'enum':
+            return {'type': 'string', 'example': 'enum_value'}
+        if output_type in self.types:
+            self.add_definition(output_type)
+            return {'$ref': f'#/definitions/{output_type}'}
+        if ',' in output_type and '<' not in output_type and '>' not in output_type:
+            items = [self.resolve(subtype.strip()) for subtype in output_type.split(',')]
+            schema = {'type': 'array', 'items': items}
+            if all('example' in item for item in items):
+                schema['example'] = [item['example'] for item in items]
+            return schema
+        return {'type': 'Unknown Type: ' + output_type, 'example': 'unknown'}
+
+    def add_definition(self, type_name):
+        if type_name in self.definitions:
+            return
+        custom_type = self.types[type_name]
+        if custom_type['type'] == 'enum':
+            enum_values = [variant['name'] for variant in custom_type['variants']]
+            self.definitions[type_name] = {'type': 'string', 'enum': enum_values, 'example': enum_values[0]}
+            return
+        # Registered before its fields are resolved, so self-referencing types terminate
+        definition = self.definitions[type_name] = {'type': 'object', 'properties': {}}
+        for field in custom_type['fields']:
+            definition['properties'][field['name']] = self.resolve(field['type'])
+
+
+def asset_response(asset, cache_control):
+    if request.if_none_match.contains(asset.etag):
+        response = Response(b"", status=304)
+    else:
+        encoding = negotiate(request.headers.get("Accept-Encoding"))
+        if encoding in asset.variants:
+            response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+            response.headers["Content-Encoding"] = encoding
+        else:
+            response = Response(asset.data, mimetype=asset.mimetype)
+    response.set_etag(asset.etag)
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def render_output(output, output_format):
+    with span("serialize"):
+        if output_format in BINARY_SERIALIZERS:
+            return Response(BINARY_SERIALIZERS[output_format](output), mimetype=MIMETYPES[output_format])
+        return jsonify(output)
+
+
+def get_addresses(app_name, values):
+    group = values.get("addressgroup")
+    if group:
+        addresses = CONFIG_DICT[app_name].get("address_groups", {}).get(group, ADDRESS_GROUPS.get(group))
+        if addresses is None:
+            return 404, f"Unknown address group: {group}"
+        return list(addresses)
+    addresses = str(values.get("smartcontractaddress") or CONFIG_DICT[app_name]["SCADDRESS"])
+    addresses = list(dict.fromkeys(address.strip() for address in addresses.split(',') if address.strip()))
+    if len(addresses) > MAX_FANOUT_ADDRESSES:
+        return 400, f"At most {MAX_FANOUT_ADDRESSES} addresses can be queried at once"
+    return addresses
+
+
+async def request_cost(app_name):
+    # Fan-outs, batches and exports make one gateway query per address, query or job and are charged for each
+    if app_name not in CONFIG_DICT:
+        return 1
+    if request.endpoint == "apps.batch_query":
+        payload = await request.get_json(force=True, silent=True)
+        queries = payload.get("queries") if isinstance(payload, dict) else None
+        return min(max(len(queries), 1), MAX_BATCH_QUERIES) if isinstance(queries, list) else 1
+    if request.endpoint == "apps.export_view":
+        payload = await request.get_json(force=True, silent=True)
+        if not isinstance(payload, dict):
+            return 1
+        addresses = export_addresses(app_name, payload)
+        arg_sets = payload.get("args") or [{}]
+        if isinstance(addresses, tuple) or not isinstance(arg_sets, list):
+            return 1
+        return max(len(addresses), 1) * min(len(arg_sets), MAX_EXPORT_ARGS)
+    if request.endpoint != "apps.endpoint_query":
+        return 1
+    addresses = get_addresses(app_name, request.args)
+    return 1 if isinstance(addresses, tuple) else max(len(addresses), 1)
+
+
+def export_addresses(app_name, payload):
+    return get_addresses(app_name, {
+        "addressgroup": payload.get("addressgroup"),
+        "smartcontractaddress": ','.join(payload.get("addresses") or [])
+    })
+
+
+def build_args(endpoint_data, values):
+    inputs = {}
+    args = []
+    for input_data in endpoint_data['inputs']:
+        input_name = input_data['name']
+        input_value = str(values.get(input_name, ''))
+        is_optional = input_data['type'].startswith("optional")
+        is_multi_arg = input_data.get('multi_arg', False)
 
+        if is_multi_arg:
+            input_values = input_value.split(',')
+            inputs[input_name] = input_values
+        else:
+            inputs[input_name] = input_value
 
-class ABITypeSchema(Schema):
-    class Meta:
-        ordered = True
-        unknown = EXCLUDE
-
-    name = fields.Str(required=True)
-    mutability = fields.Str(required=True)
-    inputs = fields.List(fields.Dict(), required=True)
-    outputs = fields.List(fields.Dict())
-
-
-def resolve_input_type(input_type):
-    cleaned_type = re.sub(r"<.*?>", "", input_type)
-    cleaned_type = re.sub(r"optional|variadic", "", cleaned_type)
-    datatypes = {
-        "BigUint": "integer",
-        "u64": "integer",
-        "Address": "string",
-        "bool": "boolean",
-        "TokenIdentifier": "string",
-        "EgldOrEsdtTokenIdentifier": "string",
-        "u32": "integer",
-        "u8": "integer"
-    }
-    return datatypes.get(cleaned_type, "string")
-
-
-def resolve_output_type(name, output_type):
-    basic_types = {
-        'i8': {'type': 'integer', 'example': 1},
-        'i16': {'type': 'integer', 'example': 12},
-        'i32': {'type': 'integer', 'example': 1234},
-        'i64': {'type': 'integer', 'example': 12345678},
-        'u8': {'type': 'integer', 'example': 1},
-        'u16': {'type': 'integer', 'example': 12},
-        'u32': {'type': 'integer', 'example': 1234},
-        'u64': {'type': 'integer', 'example': 12345678},
-        'isize': {'type': 'integer', 'example': 1},
-        'usize': {'type': 'integer', 'example': 1},
-        'bytes': {'type': 'string', 'example': 'When the time of the White Frost comes, do not eat the yellow snow!'},
-        'bool': {'type': 'boolean', 'example': False},
-        'BigUint': {'type': 'string', 'example': '69000000000000000000'},
-        'BigInt': {'type': 'string', 'example': '69000000000000000000'},
-        'EgldOrEsdtTokenIdentifier': {'type': 'string', 'example': 'EGLD'},
-        'TokenIdentifier': {'type': 'string', 'example': 'ELLAMA-6c0295'},
-        'Address': {'type': 'string', 'example': 'erd1ccxmfaganejartfyr9ack4lnudxam8ezzwn23k3x5nls97rjaeds7f2wu2'}
-    }
-
-    conditions = {
-        'variadic': lambda subtype: {
-            'type': 'array',
-            'items': resolve_output_type(name, subtype),
-            'example': [resolve_output_type(name, subtype)['example']]
-        },
-        'List': lambda subtype: {
-            'type': 'array',
-            'items': resolve_output_type(name, subtype),
-            'example': [resolve_output_type(name, subtype)['example']]
-        },
-        'vec': lambda subtype: {
-            'type': 'array',
-            'items': resolve_output_type(name, subtype),
-            'example': [resolve_output_type(name, subtype)['example']]
-        },
-        'Option': lambda subtype: {
-            'type': resolve_output_type(name, subtype)['type'],
-            'nullable': True,
-            'example': resolve_output_type(name, subtype)['example']
-        },
-        'optional': lambda subtype: resolve_output_type(name, subtype),
-        'tuple': lambda subtype: {
-            'type': 'array',
-            'items': [resolve_output_type(name, subtype_item) for subtype_item in subtype],
-            'example': [resolve_output_type(name, subtype_item)['example'] for subtype_item in subtype]
-        },
-        'enum': lambda subtype: {
-            'type': 'string',
-            'example': 'enum_value'
-        },
-        'multi': lambda subtype: {
-            'type': 'array',
-            'items': resolve_output_type(name, subtype),
-            'example': [resolve_output_type(name, subtype)['example']]
-        }
-    }
-
-    if isinstance(output_type, list):
-        output_type = output_type[0]
-
-    if isinstance(output_type, str):
-        if output_type in basic_types:
-            resolved_type = basic_types[output_type]
-        elif output_type.startswith(('optional<', 'Option<')):
-            subtype = output_type[output_type.index('<') + 1:-1]
-            resolved_type = conditions['Option'](subtype)
-        elif output_type.startswith(('variadic<', 'List<', 'vec<', 'multi<')):
-            subtype = output_type[output_type.index('<') + 1:-1]
-            resolved_type = conditions[output_type[:output_type.index('<')]](subtype)
-        elif output_type in conditions:
-            resolved_type = conditions[output_type](output_type)
+        if is_optional:
+            args.append({
+                "value": inputs[input_name][0] if is_multi_arg else inputs[input_name],
+                "type": input_data["type"]
+            })
         else:
-            custom_type = CONFIG_DICT[name]["types"].get(output_type)
-            if custom_type:
-                if custom_type['type'] == 'enum':
-                    enum_variants = custom_type['variants']
-                    enum_values = [variant['name'] for variant in enum_variants]
-                    resolved_type = {'type': 'string', 'enum': enum_values, 'example': enum_values[0]}
-                else:
-                    fields = custom_type['fields']
-                    resolved_fields = {
-                        field['name']: resolve_output_type(name, field['type'])
-                        for field in fields
-                    }
-                    resolved_type = {
-                        'type': 'object',
-                        'properties': resolved_fields,
-                        'example': {field['name']: resolve_output_type(name, field['type'])['example'] for field in fields}
-                    }
-            else:
-                if ',' in output_type and '<' not in output_type and '>' not in output_type:
-                    subtypes = [subtype.strip() for subtype in output_type.split(',')]
-                    resolved_type = {
-                        'type': 'array',
-                        'items': [resolve_output_type(name, subtype) for subtype in subtypes],
-                        'example': [resolve_output_type(name, subtype)['example'] for subtype in subtypes]
-                    }
-                else:
-                    resolved_type = {'type': 'Unknown Type: ' + output_type, 'example': 'unknown'}
-                    if resolved_type['type'].startswith('Unknown Type: Unknown Type: '):
-                        resolved_type['type'] = resolved_type['type'][18:]  # Remove the duplicated prefix
-        return resolved_type
-    else:
-        # If the output type is not a string, it means it's already resolved, so return as is
-        return output_type
+            args.append({
+                "value": str(input_value),
+                "type": input_data["type"]
+            })
+    return args
 
 
-def create_endpoint_resource_class(endpoint_data):
-    swagger_parameters = []  # List to hold the Swagger parameters
+def request_priority(default):
+    # Clients can pick their class with X-Priority, e.g. a batch job querying a normal endpoint
+    return request.headers.get("X-Priority", default).lower()
 
-    for input_data in endpoint_data['inputs']:
-        input_name = input_data['name']
-        input_type = input_data['type']
-        multi_arg = input_data.get('multi_arg', False)
-
-        # Generate Swagger parameter definition for each input
-        swagger_parameter = {
-            'name': input_name,
-            'in': 'query',
-            'required': True if not input_type.startswith("optional") else False
-        }
-
-        # Determine the data type of the input parameter
-        if multi_arg:
-            swagger_parameter['type'] = 'array'
-            swagger_parameter['items'] = {
-                'type': 'string'
-            }
-        else:
-            swagger_parameter['type'] = resolve_input_type(input_type)
-        swagger_parameters.append(swagger_parameter)
-    class_name = f"EndpointResource_{endpoint_data['name']}"
-
-    class EndpointResource(View):
-        async def dispatch_request(self):
-            url_rule = request.url_rule
-            if url_rule:
-                app_name = url_rule.rule.split('/')[1]  # Assuming the app name is the first part of the URL path
-            else:
-                app_name = "Unknown"
-            inputs = {}
-            args = []
-            scaddress = str(request.args.get("smartcontractaddress", default=CONFIG_DICT[app_name]["SCADDRESS"]))
-            for input_data in endpoint_data['inputs']:
-                input_name = input_data['name']
-                input_value = str(request.args.get(input_name, default=''))
-                is_optional = input_data['type'].startswith("optional")
-                is_multi_arg = input_data.get('multi_arg', False)
 
-                if is_multi_arg:
-                    input_values = input_value.split(',')
-                    inputs[input_name] = input_values
-                else:
-                    inputs[input_name] = input_value
+def normalize_values(values):
+    # Argument values given as JSON, lists become the comma-separated form used in query strings
+    return {
+        key: ','.join(map(str, value)) if isinstance(value, list) else str(value)
+        for key, value in (values or {}).items()
+    }
 
-                if is_optional:
-                    args.append({
-                        "value": inputs[input_name][0] if is_multi_arg else inputs[input_name],
-                        "type": input_data["type"]
-                    })
-                else:
-                    args.append({
-                        "value": str(input_value),
-                        "type": input_data["type"]
-                    })
 
-            # Process the input and call the smart contract based on the endpoint name
-            output = await parse_abi(scaddress, endpoint_data["name"], CONFIG_DICT[app_name]["endpoints"], CONFIG_DICT[app_name]["abi_json"], args)
-            code, output = output
-            if code != 200:
-                message = {"error": output}
-                response = jsonify(message)
-                response.status_code = code
-                return response
+def export_query(app_name, endpoint_name, blocks=None, block=None, fields=None):
+    app_config = CONFIG_DICT[app_name]
+    endpoint_data = app_config["endpoint_index"][endpoint_name]
+
+    async def query(address, values):
+        return await parse_abi(address, endpoint_name, app_config["endpoints"], app_config["abi_json"],
+                               build_args(endpoint_data, values), (blocks or {}).get(address, block), fields)
+
+    return query
+
+
+def get_block_options(values):
+    block = {}
+    for option in BLOCK_OPTIONS:
+        value = values.get(option)
+        if value not in (None, ''):
+            block[option] = str(value)
+    if "blockNonce" in block and not block["blockNonce"].isdigit():
+        return 400, "blockNonce must be a non-negative integer"
+    return block
+
+
+async def dispatch_endpoint(app_name, endpoint_name):
+    set_upstream_context(app_name, request_priority("interactive"))
+    profile_mode = request.args.get("profile")
+    if profile_mode in ("sample", "cprofile") and is_admin(request):
+        if profiling_busy():
+            return profiling_conflict()
+        _, profiler = await profile_call(lambda: handle_request(app_name, endpoint_name), profile_mode)
+        body, mimetype = render_profile(profiler, request.args.get("output", "text"))
+        return Response(body, mimetype=mimetype)
+    track_request(f"{app_name}/{endpoint_name}", request.args.to_dict())
+    RESULT_CACHE_HIT.set(False)
+    with request_trace(f"{app_name}/{endpoint_name}") as trace:
+        response = await handle_request(app_name, endpoint_name)
+    # Bodies of cached results are sent again, so their compressed variants are kept
+    g.reuse_body = RESULT_CACHE_HIT.get()
+    if "format" not in request.args:
+        # The format was negotiated from the Accept header, so shared caches must key on it
+        response.vary.add("Accept")
+    if trace is not None and SERVER_TIMING:
+        response.headers["Server-Timing"] = trace.server_timing()
+    return response
+
+
+async def handle_request(app_name, endpoint_name):
+    endpoint_data = CONFIG_DICT[app_name]["endpoint_index"][endpoint_name]
+    addresses = get_addresses(app_name, request.args)
+    if isinstance(addresses, tuple):
+        return error_response(*addresses)
+    block = get_block_options(request.args)
+    if isinstance(block, tuple):
+        return error_response(*block)
+    output_format = get_output_format(request.args.get("format"), request.headers.get("Accept"))
+    if isinstance(output_format, tuple):
+        return error_response(*output_format)
+    decode = output_format not in UNDECODED_FORMATS
+    args = build_args(endpoint_data, request.args)
+
+    if len(addresses) != 1 or "addressgroup" in request.args:
+        # Same view over many contracts sharing this ABI, errors are reported per address
+        results = await fan_out_query(addresses, endpoint_data["name"], CONFIG_DICT[app_name]["endpoints"],
+                                      CONFIG_DICT[app_name]["abi_json"], args, block, FANOUT_CONCURRENCY,
+                                      request.args.get("fields"), decode)
+        if not decode:
+            results = {
+                address: encode_return_data(result, output_format) if isinstance(result, list) else result
+                for address, result in results.items()
+            }
+        return render_output(results, output_format)
+    scaddress = addresses[0]
 
-            return jsonify(output)
+    # Process the input and call the smart contract based on the endpoint name
+    output = await parse_abi(scaddress, endpoint_data["name"], CONFIG_DICT[app_name]["endpoints"], CONFIG_DICT[app_name]["abi_json"], args, block, request.args.get("fields"), decode)
+    code, output = output
+    if code != 200:
+        return error_response(code, output)
+    if not decode:
+        output = encode_return_data(output, output_format)
 
-    EndpointResource.__name__ = class_name
-    return EndpointResource
+    return render_output(output, output_format)
 
 
 def generate_custom_swagger_json(name=""):
@@ -242,10 +350,10 @@ def generate_custom_swagger_json(name=""):
         ]
     }
 
+    schemas = OutputSchemas(CONFIG_DICT[display_name]["types"])
     for endpoint in CONFIG_DICT[display_name]["endpoints"]:
         if endpoint["mutability"] == "readonly":
-            schema = ABITypeSchema()
-            endpoint_data = schema.load(endpoint)
+            endpoint_data = CONFIG_DICT[display_name]["endpoint_index"][endpoint["name"]]
             # Generate the path for the Swagger JSON specification
             swagger_path = f"/{name}{endpoint['name']}"
             swagger_parameters = []
@@ -272,11 +380,30 @@ def generate_custom_swagger_json(name=""):
                 else:
                     swagger_parameter['type'] = 'string'
                 swagger_parameters.append(swagger_parameter)
+            swagger_parameters.extend([
+                {'name': 'blockNonce', 'in': 'query', 'required': False, 'type': 'integer',
+                 'description': 'Query the contract state as of this block nonce'},
+                {'name': 'blockHash', 'in': 'query', 'required': False, 'type': 'string',
+                 'description': 'Query the contract state as of this block hash'},
+                {'name': 'fields', 'in': 'query', 'required': False, 'type': 'string',
+                 'description': 'Comma-separated struct fields to return, nested as `items.owner`'},
+                {'name': 'format', 'in': 'query', 'required': False, 'type': 'string',
+                 'enum': ['json', 'raw', 'hex', 'msgpack', 'cbor'],
+                 'description': 'Output format, `raw`/`hex` return the undecoded returnData'}
+            ])
             # Additional handling for the "docs" field
             if "docs" in endpoint:
                 description = "\n".join(endpoint["docs"])
             else:
                 description = f"No documentation available for {endpoint['name']}."
+            # Generate the definition for the Swagger JSON specification
+            swagger_json['definitions'][f"{endpoint['name']}_response"] = {
+                'type': 'object',
+                'properties': {
+                    output_data.get('name', 'output'): schemas.resolve(output_data.get('type', 'output'))
+                    for output_data in endpoint.get('outputs', [])
+                }
+            }
             swagger_json['paths'][swagger_path] = {
                 'get': {
                     'summary': endpoint['name'],
@@ -285,118 +412,470 @@ def generate_custom_swagger_json(name=""):
                     'responses': {
                         '200': {
                             'description': 'Success',
-                            'schema': {
-                                'type': 'object',
-                                'properties': {
-                                    output_data.get('name', 'output'): resolve_output_type(
-                                        display_name,
-                                        output_data.get('type', 'output'))
-                                    for output_data in endpoint.get('outputs', [])
-                                }
-                            }
+                            'schema': {'$ref': f"#/definitions/{endpoint['name']}_response"}
                         }
                     },
                     'tags': [display_name]
                 }
             }
-            # Generate the definition for the Swagger JSON specification
-            swagger_definition = {
-                'type': 'object',
-                'properties': {
-                    output_data.get('name', 'output'): resolve_output_type(display_name, output_data.get('type', 'output'))
-                    for output_data in endpoint.get('outputs', [])
-                }
-            }
-            swagger_json['definitions'][f"{endpoint['name']}_response"] = swagger_definition
             # Update the Swagger parameter to represent the multi_arg input as an array
             for parameter in swagger_parameters:
                 if parameter['name'] in endpoint_data['inputs']:
                     parameter['x-multi-item'] = True
 
+    swagger_json['definitions'].update(schemas.definitions)
     return swagger_json
 
 
-def create_api_blueprint(sc_address, abi_path, name=""):
-    bp = Blueprint(name, __name__)
+def get_swagger_json(name):
+    display_name = name.replace('/', '')
+    if "swagger" not in CONFIG_DICT[display_name]:
+        CONFIG_DICT[display_name]["swagger"] = generate_custom_swagger_json(name)
+    return CONFIG_DICT[display_name]["swagger"]
+
+
+def load_abi(abi_path):
     # Load ABI JSON from the internet
     if abi_path.startswith("https://") or abi_path.startswith("http://"):
-        abi_json = requests.get(abi_path).json()
-    else:
-        # Load ABI JSON from file
-        with open(abi_path) as f:
-            abi_json = json.load(f)
-    endpoints = abi_json["endpoints"]
-    types = abi_json["types"]
-    CONFIG_DICT[name.replace('/', '')] = {
+        import requests
+        return requests.get(abi_path).content
+    # Load ABI JSON from file
+    with open(abi_path, 'rb') as f:
+        return f.read()
+
+
+def load_endpoint(endpoint):
+    from schemas import ABITypeSchema
+    return ABITypeSchema().load(endpoint)
+
+
+def compile_artifact(sc_address, abi_bytes, name=""):
+    abi_json = json.loads(abi_bytes)
+    return {
+        "abi_hash": hashlib.sha256(abi_bytes).hexdigest(),
+        "code_version": code_version(),
+        "NAME": name.replace('/', ''),
+        "SCADDRESS": sc_address,
         "abi_json": abi_json,
-        "types": types,
-        "endpoints": endpoints,
-        "SCADDRESS": sc_address
+        "readonly_endpoints": [
+            load_endpoint(endpoint) for endpoint in abi_json["endpoints"] if endpoint["mutability"] == "readonly"
+        ]
     }
 
-    @bp.route(f'/api/{name}swagger.json')
-    async def custom_swagger():
-        return jsonify(generate_custom_swagger_json(name))
-
-    @bp.route(f'/{name}')
-    async def api_docs():
-        swagger_ui_html = f'''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>ABI2API - {name.replace('/', '')}</title>
-            <link rel="icon" type="image/png" size="32x32" href="https://wallet.multiversx.com/favicon-32x32.png">
-            <link rel="stylesheet" type="text/css" href="https://cdnjs.cloudflare.com/ajax/libs/swagger-ui/3.52.1/swagger-ui.min.css">
-            <script src="https://cdnjs.cloudflare.com/ajax/libs/swagger-ui/3.52.1/swagger-ui-bundle.min.js"></script>
-            <script src="https://cdnjs.cloudflare.com/ajax/libs/swagger-ui/3.52.1/swagger-ui-standalone-preset.min.js"></script>
-
-            <style>
-        ''' + CSS + '''
-
-      </style>
-        </head>
-        <body>
-    <div class="topbar"><div class="wrapper"><div class="topbar-wrapper"><center><img src="https://cdn.discordapp.com/attachments/1002615966598967358/1131252032616005812/new_logo.png" height=50% width=50%/></center></div></div></div>
-            <div id="swagger-ui"></div>
-            <script>
-                SwaggerUIBundle({
-                    url: window.location.origin + "/" + ''' + f"'api/{name}swagger.json'," + '''
-                    dom_id: '#swagger-ui',
-                    deepLinking: true,
-                    presets: [
-                        SwaggerUIBundle.presets.apis,
-                        SwaggerUIStandalonePreset
-                    ]
-                });
-            </script>
-        </body>
-
-        </html>
-        '''
-        return swagger_ui_html
-
-    # Register the resource classes
-    for endpoint in CONFIG_DICT[name.replace('/', '')]["endpoints"]:
-        if endpoint["mutability"] == "readonly":
-            schema = ABITypeSchema()
-            endpoint_data = schema.load(endpoint)
-            resource_class = create_endpoint_resource_class(endpoint_data)
-            endpoint_name = endpoint['name']
-
-            # Add the route
-            bp.add_url_rule(
-                f"/{name}{endpoint_name}",
-                view_func=resource_class.as_view(endpoint_name),
-                methods=['GET']
-            )
+
+def install_artifact(artifact):
+    abi_json = intern_abi(artifact["abi_json"])
+    readonly_endpoints = intern_abi(artifact["readonly_endpoints"])
+    compiled = {
+        "abi_json": abi_json,
+        "types": abi_json["types"],
+        "endpoints": abi_json["endpoints"],
+        "readonly_endpoints": readonly_endpoints,
+        "endpoint_index": {endpoint["name"]: endpoint for endpoint in readonly_endpoints}
+    }
+    if "swagger" in artifact:
+        compiled["swagger"] = artifact["swagger"]
+    DECODE_POOL.register(abi_json)
+    return compiled
+
+
+def compile_meta(meta):
+    artifact = read_artifact(BUILD_DIR, meta.name, meta.abi_hash, meta.sc_address)
+    if artifact is None:
+        artifact = compile_artifact(meta.sc_address, zlib.decompress(meta.abi_blob), meta.name)
+    return install_artifact(artifact)
+
+
+def release_compiled(compiled):
+    release_parser(compiled["abi_json"])
+    DECODE_POOL.forget(compiled["abi_json"])
+
+
+REGISTRY = ABIRegistry(compile_meta, getattr(config, "MAX_COMPILED_APPS", 0), release_compiled)
+
+
+def register_app(sc_address, abi_bytes, name=""):
+    # Registering only reads the endpoint names, decoders and Swagger are built when the app is first used
+    abi_json = json.loads(abi_bytes)
+    meta = AppMeta(
+        name.replace('/', ''),
+        sc_address,
+        hashlib.sha256(abi_bytes).hexdigest(),
+        frozenset(sys.intern(endpoint["name"]) for endpoint in abi_json["endpoints"]
+                  if endpoint["mutability"] == "readonly"),
+        zlib.compress(abi_bytes)
+    )
+    clashes = sorted(meta.endpoint_names.intersection(RESERVED_ENDPOINT_NAMES))
+    if clashes:
+        raise ValueError(f"Readonly endpoint names clash with built-in /{meta.name}/ routes: {', '.join(clashes)}")
+    REGISTRY.evict(meta.name)
+    CONFIG_DICT[meta.name] = AppConfig(meta, REGISTRY)
+    return meta
+
+
+def compile_app(sc_address, abi_bytes, name="", include_swagger=False):
+    meta = register_app(sc_address, abi_bytes, name)
+    artifact = compile_artifact(sc_address, abi_bytes, name)
+    REGISTRY.install(meta.name, install_artifact(artifact))
+    if include_swagger:
+        artifact["swagger"] = get_swagger_json(name)
+        artifact["routes"] = list(artifact["swagger"]["paths"])
+    return artifact
+
+
+def create_api_blueprint():
+    # One set of routes serves every app, the app and endpoint are resolved with dict lookups per request
+    bp = Blueprint("apps", __name__)
+
+    @bp.before_request
+    async def rate_limit():
+        if request.endpoint not in RATE_LIMITED_ROUTES:
+            return None
+        app_name = request.view_args["app_name"]
+        endpoint_name = request.view_args.get("endpoint_name", RATE_LIMITED_ROUTES[request.endpoint])
+        retry_after = RATE_LIMITER.check(app_name, endpoint_name, client_key(request, API_KEYS),
+                                         await request_cost(app_name))
+        if retry_after:
+            response = error_response(429, "Too many requests")
+            response.headers["Retry-After"] = str(retry_after)
+            return response
+
+    @bp.route('/api/<app_name>/swagger.json')
+    async def custom_swagger(app_name):
+        if app_name not in CONFIG_DICT:
+            return error_response(404, "Not found")
+        g.reuse_body = True
+        return jsonify(get_swagger_json(f"{app_name}/"))
+
+    @bp.route('/<app_name>/')
+    async def api_docs(app_name):
+        if app_name not in CONFIG_DICT:
+            return error_response(404, "Not found")
+        # The page only changes with a new deploy, clients revalidate it with its ETag
+        return asset_response(docs_page(f"{app_name}/"), "no-cache")
+
+    @bp.route('/<app_name>/batch', methods=['POST'])
+    async def batch_query(app_name):
+        # Every query of a batch is pinned to the same block, so the results form a consistent snapshot
+        if app_name not in CONFIG_DICT:
+            return error_response(404, "Not found")
+        set_upstream_context(app_name, request_priority("interactive"))
+        payload = await request.get_json(force=True, silent=True)
+        track_request(f"{app_name}/batch", payload)
+        if not isinstance(payload, dict) or not isinstance(payload.get("queries"), list):
+            return error_response(400, "Body must be a JSON object with a 'queries' list")
+        if len(payload["queries"]) > MAX_BATCH_QUERIES:
+            return error_response(400, f"At most {MAX_BATCH_QUERIES} queries can be sent in one batch")
+        readonly_endpoints = CONFIG_DICT[app_name]["endpoint_index"]
+        queries = []
+        for query in payload["queries"]:
+            if not isinstance(query, dict) or query.get("endpoint") not in readonly_endpoints:
+                return error_response(400, f"Unknown endpoint in batch query: {query}")
+            values = normalize_values(query.get("args"))
+            scaddress = str(query.get("smartcontractaddress", CONFIG_DICT[app_name]["SCADDRESS"]))
+            queries.append((query["endpoint"], scaddress, build_args(readonly_endpoints[query["endpoint"]], values),
+                            query.get("fields")))
+
+        block = get_block_options(payload)
+        if isinstance(block, tuple):
+            return error_response(*block)
+        if block:
+            blocks = {scaddress: block for _, scaddress, _, _ in queries}
+        else:
+            nonces = await resolve_block_nonces(sorted({scaddress for _, scaddress, _, _ in queries}))
+            if isinstance(nonces, tuple):
+                return error_response(*nonces)
+            blocks = {scaddress: {"blockNonce": str(nonce)} for scaddress, nonce in nonces.items()}
+
+        # The block is fixed, so the queries can run concurrently and still see the same state
+        semaphore = asyncio.Semaphore(FANOUT_CONCURRENCY)
+
+        async def run_query(endpoint_name, scaddress, args, fields):
+            async with semaphore:
+                return await parse_abi(scaddress, endpoint_name, CONFIG_DICT[app_name]["endpoints"],
+                                       CONFIG_DICT[app_name]["abi_json"], args, blocks[scaddress], fields)
+
+        outputs = await asyncio.gather(*(run_query(*query) for query in queries))
+        results = [{"endpoint": endpoint_name, "data": output} if code == 200 else
+                   {"endpoint": endpoint_name, "error": output, "code": code}
+                   for (endpoint_name, _, _, _), (code, output) in zip(queries, outputs)]
+        return jsonify({
+            "blocks": blocks,
+            "results": results
+        })
+
+    @bp.route('/<app_name>/export', methods=['POST'])
+    async def export_view(app_name):
+        # Streams one row per address and argument set, without holding the results in memory
+        if app_name not in CONFIG_DICT:
+            return error_response(404, "Not found")
+        set_upstream_context(app_name, request_priority("bulk"))
+        payload = await request.get_json(force=True, silent=True)
+        track_request(f"{app_name}/export", payload)
+        if not isinstance(payload, dict) or payload.get("endpoint") not in CONFIG_DICT[app_name].meta.endpoint_names:
+            return error_response(400, "Body must be a JSON object with a readonly 'endpoint'")
+        export_format = payload.get("format", "ndjson")
+        if export_format not in EXPORT_FORMATS:
+            return error_response(400, f"format must be one of: {', '.join(sorted(EXPORT_FORMATS))}")
+        addresses = export_addresses(app_name, payload)
+        if isinstance(addresses, tuple):
+            return error_response(*addresses)
+        if not isinstance(payload.get("args") or [], list):
+            return error_response(400, "args must be a list of argument objects")
+        if len(payload.get("args") or []) > MAX_EXPORT_ARGS:
+            return error_response(400, f"At most {MAX_EXPORT_ARGS} argument sets can be exported at once")
+        arg_sets = [normalize_values(values) for values in payload.get("args") or [{}]]
+        block = get_block_options(payload)
+        if isinstance(block, tuple):
+            return error_response(*block)
+        blocks = None
+        if not block:
+            # Pinned to one block per shard, so a long export is still a consistent snapshot
+            nonces = await resolve_block_nonces(addresses)
+            if isinstance(nonces, tuple):
+                return error_response(*nonces)
+            blocks = {address: {"blockNonce": str(nonce)} for address, nonce in nonces.items()}
+        query = export_query(app_name, payload["endpoint"], blocks, block, payload.get("fields"))
+        rows = run_export(iter_jobs(addresses, lambda: arg_sets), query, FANOUT_CONCURRENCY)
+        response = Response(export_lines(rows, export_format), mimetype=EXPORT_FORMATS[export_format])
+        response.timeout = None
+        return response
+
+    @bp.route('/<app_name>/<endpoint_name>/history')
+    async def endpoint_history(app_name, endpoint_name):
+        # Served from the history store only, the gateway is never queried here
+        app_config = CONFIG_DICT.get(app_name)
+        if HISTORY_STORE is None or app_config is None or endpoint_name not in app_config.meta.endpoint_names:
+            return error_response(404, "Not found")
+        try:
+            start = float(request.args.get("from", 0))
+            end = float(request.args["to"]) if "to" in request.args else None
+            limit = min(max(int(request.args.get("limit", 1000)), 1), MAX_HISTORY_POINTS)
+        except ValueError:
+            return error_response(400, "from and to must be unix timestamps and limit an integer")
+        endpoint_data = app_config["endpoint_index"][endpoint_name]
+        values = {input_data["name"]: request.args.get(input_data["name"], '') for input_data in endpoint_data["inputs"]}
+        sc_address = request.args.get("smartcontractaddress") or app_config["SCADDRESS"]
+        return jsonify({
+            "points": HISTORY_STORE.range(series_key(app_name, sc_address, endpoint_name, values), start, end, limit)
+        })
+
+    @bp.route('/<app_name>/<endpoint_name>')
+    async def endpoint_query(app_name, endpoint_name):
+        app_config = CONFIG_DICT.get(app_name)
+        if app_config is None or endpoint_name not in app_config.meta.endpoint_names:
+            return error_response(404, "Not found")
+        return await dispatch_endpoint(app_name, endpoint_name)
+
     return bp
 
 
-if __name__ == '__main__':
+def setup_app(process, abi_bytes):
+    meta = register_app(process["SCADDRESS"], abi_bytes, process["NAME"])
+    RATE_LIMITER.remove_app(meta.name)
+    RATE_LIMITER.configure_app(meta.name, process.get("RATE_LIMIT"), process.get("ENDPOINT_RATE_LIMITS"))
+    SCHEDULER.configure_app(meta.name, process.get("CONCURRENCY"), process.get("WEIGHT"))
+    CONFIG_DICT[meta.name]["address_groups"] = process.get("ADDRESS_GROUPS", {})
+    return meta
+
+
+def remove_app(name):
+    CONFIG_DICT.pop(name, None)
+    REGISTRY.evict(name)
+    RATE_LIMITER.remove_app(name)
+    SCHEDULER.configure_app(name)
+
+
+def create_apps_admin_blueprint():
+    bp = Blueprint("apps_admin", __name__)
+
+    @bp.before_request
+    async def check_admin():
+        if not is_admin(request):
+            return admin_denied()
+
+    @bp.route('/admin/apps')
+    async def list_apps():
+        return jsonify({
+            name: {
+                "SCADDRESS": app_config.meta.sc_address,
+                "endpoints": len(app_config.meta.endpoint_names),
+                "compiled": REGISTRY.is_compiled(name)
+            }
+            for name, app_config in CONFIG_DICT.items()
+        })
+
+    @bp.route('/admin/apps', methods=['POST'])
+    async def register_app_endpoint():
+        # Apps registered here are not written back to the config, they are gone after a restart
+        process = await request.get_json(force=True, silent=True)
+        if not isinstance(process, dict) or not isinstance(process.get("SCADDRESS"), str) \
+                or not APP_NAME_PATTERN.match(str(process.get("NAME", ""))) or process["NAME"] in RESERVED_APP_NAMES:
+            return error_response(400, "Body must be a JSON object with a valid NAME and SCADDRESS")
+        try:
+            if isinstance(process.get("ABI"), dict):
+                abi_bytes = json.dumps(process["ABI"]).encode()
+            elif isinstance(process.get("ABI_PATH"), str):
+                abi_bytes = await asyncio.to_thread(load_abi, process["ABI_PATH"])
+            else:
+                return error_response(400, "Either ABI or ABI_PATH is required")
+            replaced = process["NAME"] in CONFIG_DICT
+            meta = setup_app(process, abi_bytes)
+        except Exception as e:
+            return error_response(400, f"Could not load the ABI: {e}")
+        response = jsonify({"NAME": meta.name, "endpoints": sorted(meta.endpoint_names)})
+        response.status_code = 200 if replaced else 201
+        return response
+
+    @bp.route('/admin/apps/<name>', methods=['DELETE'])
+    async def unregister_app(name):
+        if name not in CONFIG_DICT:
+            return error_response(404, f"Unknown app: {name}")
+        remove_app(name)
+        return jsonify({"removed": name})
+
+    return bp
+
+
+def create_app():
     app = Quart(__name__)
     for process in APIS:
-        app_name = f"{process['NAME']}/"
-        app.register_blueprint(create_api_blueprint(process["SCADDRESS"], process["ABI_PATH"], app_name))
+        setup_app(process, load_abi(process["ABI_PATH"]))
+    app.register_blueprint(create_api_blueprint())
+    app.register_blueprint(create_admin_blueprint())
+    app.register_blueprint(create_apps_admin_blueprint())
+    load_assets()
+
+    @app.route(f'{ASSETS_URL_PATH}<path:file_name>')
+    async def static_asset(file_name):
+        # Asset file names contain a hash of their content, so they can be cached forever
+        if file_name not in ASSETS:
+            return error_response(404, "Not found")
+        return asset_response(ASSETS[file_name], "public, max-age=31536000, immutable")
+
+    @app.before_request
+    async def admit_request():
+        # Shed load before requests pile up in the event loop
+        if not IN_FLIGHT_LIMITER.acquire():
+            response = error_response(503, "Server is overloaded, try again later")
+            response.headers["Retry-After"] = "1"
+            return response
+        g.admitted = True
+
+    @app.after_request
+    async def compress_response(response):
+        if response.headers.get("Content-Encoding") or not isinstance(response.response, DataBody) \
+                or not COMPRESSOR.is_compressible(response.mimetype):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate(request.headers.get("Accept-Encoding"))
+        data = await response.get_data()
+        if encoding is None or len(data) < COMPRESSOR.min_size:
+            return response
+        response.set_data(await COMPRESSOR.compress(data, encoding, g.get("reuse_body", False)))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    @app.teardown_request
+    async def release_request(exc):
+        if g.get("admitted"):
+            IN_FLIGHT_LIMITER.release()
+
+    result_store_path = getattr(config, "RESULT_STORE_PATH", None)
+    if result_store_path:
+        loaded = open_result_store(result_store_path, getattr(config, "RESULT_STORE_MAX_BYTES", 256 * 1024 * 1024))
+        print(f"Loaded {loaded} cached results from {result_store_path}")
+
+        @app.after_serving
+        async def shutdown_result_store():
+            await asyncio.to_thread(close_result_store)
+
+    @app.after_serving
+    async def shutdown_decode_pool():
+        await stop_warm_up()
+        DECODE_POOL.shutdown()
+        await close_session()
+        if GATEWAY_RECORDER is not None:
+            await asyncio.to_thread(GATEWAY_RECORDER.close)
+        await asyncio.to_thread(close_trace_writer)
+
+    @app.before_serving
+    async def begin_warm_up():
+        apps = []
+        for process in APIS:
+            if "WARMUP" not in process:
+                # Compiling every app at startup would defeat the lazy compilation
+                continue
+            app_config = CONFIG_DICT[process["NAME"]]
+            readonly_endpoints = app_config["endpoint_index"]
+            views = []
+            for view in process.get("WARMUP", {}).get("views", []):
+                values = {key: str(value) for key, value in view.get("args", {}).items()}
+                views.append((view.get("smartcontractaddress", app_config["SCADDRESS"]), view["endpoint"],
+                              build_args(readonly_endpoints[view["endpoint"]], values)))
+            apps.append({
+                "name": process["NAME"],
+                "abi_json": app_config["abi_json"],
+                "endpoints": app_config["endpoints"],
+                "views": views
+            })
+        # Runs in the background, /ready reports when it is done
+        start_warm_up(apps)
+
+    @app.route('/ready')
+    async def ready():
+        response = jsonify(WARMUP_STATE.to_dict())
+        response.status_code = 200 if WARMUP_STATE.ready else 503
+        return response
+
+    history_path = getattr(config, "HISTORY_PATH", None)
+    if history_path:
+        global HISTORY_STORE
+        HISTORY_STORE = HistoryStore(history_path)
+        history_views = []
+        for process in APIS:
+            for view in process.get("HISTORY", []):
+                endpoint_data = CONFIG_DICT[process["NAME"]]["endpoint_index"][view["endpoint"]]
+                values = normalize_values(view.get("args"))
+                values = {input_data["name"]: values.get(input_data["name"], '') for input_data in endpoint_data["inputs"]}
+                sc_address = view.get("smartcontractaddress", process["SCADDRESS"])
+                query = export_query(process["NAME"], view["endpoint"])
+                history_views.append({
+                    "app": process["NAME"],
+                    "series": series_key(process["NAME"], sc_address, view["endpoint"], values),
+                    "interval": view.get("interval", 60),
+                    "query": lambda query=query, sc_address=sc_address, values=values: query(sc_address, values)
+                })
+        history_poller = HistoryPoller(HISTORY_STORE, history_views)
+
+        @app.before_serving
+        async def start_history_poller():
+            history_poller.start()
+
+        @app.after_serving
+        async def stop_history_poller():
+            await history_poller.stop()
+            HISTORY_STORE.close()
+
+    if getattr(config, "LOOP_LAG_THRESHOLD", 0.25):
+        loop_monitor = LoopMonitor(getattr(config, "LOOP_LAG_INTERVAL", 0.1), getattr(config, "LOOP_LAG_THRESHOLD", 0.25))
+
+        @app.before_serving
+        async def start_loop_monitor():
+            loop_monitor.start()
+
+        @app.after_serving
+        async def stop_loop_monitor():
+            loop_monitor.stop()
+
+    if getattr(config, "METRICS_ENABLED", True):
+        @app.route('/metrics')
+        async def metrics_endpoint():
+            return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    return app
 
 
-    uvicorn.run(app, port=PORT, host="0.0.0.0")
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(create_app(), port=PORT, host="0.0.0.0")
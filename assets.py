@@ -0,0 +1,106 @@
+import hashlib
+import os
+from typing import Dict
+from compression import COMPRESSORS
+from dark_theme_css import CSS
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+ASSETS_URL_PATH = "/assets/"
+SWAGGER_UI_VERSION = "3.52.1"
+# Third-party files served from STATIC_DIR once downloaded with "python build.py --assets", from their CDN otherwise
+REMOTE_ASSETS = {
+    "swagger-ui.css": f"https://cdnjs.cloudflare.com/ajax/libs/swagger-ui/{SWAGGER_UI_VERSION}/swagger-ui.min.css",
+    "swagger-ui-bundle.js": f"https://cdnjs.cloudflare.com/ajax/libs/swagger-ui/{SWAGGER_UI_VERSION}/swagger-ui-bundle.min.js",
+    "swagger-ui-standalone-preset.js": f"https://cdnjs.cloudflare.com/ajax/libs/swagger-ui/{SWAGGER_UI_VERSION}/swagger-ui-standalone-preset.min.js",
+    "favicon.png": "https://wallet.multiversx.com/favicon-32x32.png",
+    "logo.png": "https://cdn.discordapp.com/attachments/1002615966598967358/1131252032616005812/new_logo.png"
+}
+MIMETYPES = {
+    ".css": "text/css",
+    ".js": "application/javascript",
+    ".png": "image/png",
+    ".html": "text/html"
+}
+
+
+class Asset:
+    __slots__ = ("data", "mimetype", "etag", "variants")
+
+    def __init__(self, data: bytes, mimetype: str) -> None:
+        self.data = data
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(data).hexdigest()[:16]
+        # Compressed once here instead of on every request, images are already compressed
+        self.variants: Dict[str, bytes] = {}
+        if not mimetype.startswith("image/"):
+            self.variants = {encoding: compress(data) for encoding, compress in COMPRESSORS.items()}
+
+
+ASSETS: Dict[str, Asset] = {}
+ASSET_URLS: Dict[str, str] = {}
+DOCS_PAGES: Dict[str, Asset] = {}
+
+
+def add_asset(logical_name: str, data: bytes) -> None:
+    base, extension = os.path.splitext(logical_name)
+    asset = Asset(data, MIMETYPES.get(extension, "application/octet-stream"))
+    file_name = f"{base}.{asset.etag[:12]}{extension}"
+    ASSETS[file_name] = asset
+    ASSET_URLS[logical_name] = ASSETS_URL_PATH + file_name
+
+
+def load_assets() -> None:
+    add_asset("theme.css", CSS.encode())
+    for logical_name, url in REMOTE_ASSETS.items():
+        path = os.path.join(STATIC_DIR, logical_name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                add_asset(logical_name, f.read())
+        else:
+            ASSET_URLS[logical_name] = url
+
+
+def download_assets() -> None:
+    import requests
+    os.makedirs(STATIC_DIR, exist_ok=True)
+    for logical_name, url in REMOTE_ASSETS.items():
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        with open(os.path.join(STATIC_DIR, logical_name), "wb") as f:
+            f.write(response.content)
+        print(f"{logical_name}: {len(response.content)} bytes from {url}")
+
+
+def docs_page(name: str) -> Asset:
+    if not ASSET_URLS:
+        load_assets()
+    if name not in DOCS_PAGES:
+        html = f'''<!DOCTYPE html>
+<html>
+<head>
+    <title>ABI2API - {name.replace('/', '')}</title>
+    <link rel="icon" type="image/png" size="32x32" href="{ASSET_URLS['favicon.png']}">
+    <link rel="stylesheet" type="text/css" href="{ASSET_URLS['swagger-ui.css']}">
+    <link rel="stylesheet" type="text/css" href="{ASSET_URLS['theme.css']}">
+    <script src="{ASSET_URLS['swagger-ui-bundle.js']}"></script>
+    <script src="{ASSET_URLS['swagger-ui-standalone-preset.js']}"></script>
+</head>
+<body>
+    <div class="topbar"><div class="wrapper"><div class="topbar-wrapper"><center><img src="{ASSET_URLS['logo.png']}" height=50% width=50%/></center></div></div></div>
+    <div id="swagger-ui"></div>
+    <script>
+        SwaggerUIBundle({{
+            url: window.location.origin + "/api/{name}swagger.json",
+            dom_id: '#swagger-ui',
+            deepLinking: true,
+            presets: [
+                SwaggerUIBundle.presets.apis,
+                SwaggerUIStandalonePreset
+            ]
+        }});
+    </script>
+</body>
+</html>
+'''
+        DOCS_PAGES[name] = Asset(html.encode(), "text/html")
+    return DOCS_PAGES[name]
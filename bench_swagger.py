@@ -0,0 +1,74 @@
+import argparse
+import json
+import re
+import time
+
+SC_ADDRESS = "erd1qqqqqqqqqqqqqpgqeel2kumf0r8ffyhth7pqdujjat9nx0862jpsg2pqaq"
+REF = re.compile(r'\{"\$ref": "#/definitions/([^"]+)"\}')
+
+
+def synthetic_abi(depth, width, endpoints):
+    # Struct i has `width` fields of struct i + 1, every endpoint returns a list of the top struct
+    types = {}
+    for level in range(depth):
+        field_type = f"Struct{level + 1}" if level + 1 < depth else "BigUint"
+        types[f"Struct{level}"] = {
+            "type": "struct",
+            "fields": [{"name": f"field{index}", "type": field_type} for index in range(width)] +
+                      [{"name": "maybe", "type": f"Option<{field_type}>"}]
+        }
+    return {
+        "name": f"Synthetic{depth}x{width}",
+        "endpoints": [
+            {"name": f"view{index}", "mutability": "readonly", "inputs": [],
+             "outputs": [{"type": "variadic<Struct0>" if index % 2 else "Struct0"}]}
+            for index in range(endpoints)
+        ],
+        "types": types
+    }
+
+
+def inlined_size(spec):
+    # Size the spec would have with every $ref replaced by its definition, computed without building it
+    definitions = spec["definitions"]
+    sizes = {}
+
+    def size_of(text):
+        return len(REF.sub("", text)) + sum(definition_size(match) for match in REF.findall(text))
+
+    def definition_size(name):
+        if name not in sizes:
+            sizes[name] = 0
+            sizes[name] = size_of(json.dumps(definitions[name]))
+        return sizes[name]
+
+    return size_of(json.dumps(spec["paths"]))
+
+
+def measure(api, name, abi_bytes):
+    api.register_app(SC_ADDRESS, abi_bytes, f"{name}/")
+    started = time.perf_counter()
+    spec = api.generate_custom_swagger_json(f"{name}/")
+    elapsed = time.perf_counter() - started
+    size = len(json.dumps(spec))
+    print(f"{name:<24} {elapsed * 1000:>9.1f} ms {size / 1024:>10.1f} KiB {inlined_size(spec) / 1024:>14.1f} KiB")
+
+
+def main():
+    import api
+    parser = argparse.ArgumentParser(description="Measure Swagger spec generation time and size.")
+    parser.add_argument("--depth", type=int, default=8, help="Deepest struct nesting of the synthetic ABIs")
+    parser.add_argument("--width", type=int, default=3, help="Fields per struct of the synthetic ABIs")
+    parser.add_argument("--endpoints", type=int, default=50, help="Endpoints of the synthetic ABIs")
+    parser.add_argument("--abi", action="append", default=[], help="Also measure this ABI file")
+    options = parser.parse_args()
+    print(f"{'ABI':<24} {'time':>12} {'spec size':>14} {'inlined size':>18}")
+    for depth in range(1, options.depth + 1):
+        abi = synthetic_abi(depth, options.width, options.endpoints)
+        measure(api, abi["name"], json.dumps(abi).encode())
+    for path in options.abi:
+        measure(api, path.rsplit("/", 1)[-1].split(".")[0], api.load_abi(path))
+
+
+if __name__ == '__main__':
+    main()
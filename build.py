@@ -0,0 +1,73 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from functools import lru_cache
+
+# Bump when the artifact layout changes
+ARTIFACT_FORMAT = 2
+# Modules whose output (endpoint data, Swagger spec) is stored in the artifacts
+ARTIFACT_SOURCES = ("api.py", "build.py", "formats.py", "schemas.py", "TypeParser.py")
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    # Artifacts built by another version of the code may hold a stale spec, so they are rebuilt
+    digest = hashlib.sha256(str(ARTIFACT_FORMAT).encode())
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for source in ARTIFACT_SOURCES:
+        with open(os.path.join(base_dir, source), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def artifact_path(build_dir, name, abi_hash):
+    return os.path.join(build_dir, f"{name}-{abi_hash[:16]}.json")
+
+
+def read_artifact(build_dir, name, abi_hash, sc_address):
+    path = artifact_path(build_dir, name, abi_hash)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # The artifact embeds the contract address in its Swagger spec, so a changed address means a rebuild
+    if artifact.get("abi_hash") != abi_hash or artifact.get("SCADDRESS") != sc_address \
+            or artifact.get("code_version") != code_version():
+        return None
+    return artifact
+
+
+def write_artifact(build_dir, artifact):
+    os.makedirs(build_dir, exist_ok=True)
+    path = artifact_path(build_dir, artifact["NAME"], artifact["abi_hash"])
+    with open(path + ".tmp", "w") as f:
+        json.dump(artifact, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def main():
+    import api
+    parser = argparse.ArgumentParser(description="Precompile every configured ABI into startup artifacts.")
+    parser.add_argument("--out", default=api.BUILD_DIR, help="Directory to write the artifacts to")
+    parser.add_argument("--assets", action="store_true", help="Also download the Swagger UI files to serve them locally")
+    options = parser.parse_args()
+    if options.assets:
+        from assets import download_assets
+        download_assets()
+    for process in api.APIS:
+        started = time.perf_counter()
+        artifact = api.compile_app(process["SCADDRESS"], api.load_abi(process["ABI_PATH"]), f"{process['NAME']}/",
+                                   include_swagger=True)
+        path = write_artifact(options.out, artifact)
+        print(f"{process['NAME']}: {len(artifact['routes'])} routes -> {path} "
+              f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
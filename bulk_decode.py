@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decode_pool import init_worker, decode_lines_in_worker
+from TypeParser import build_projection
+
+INPUT_FORMATS = ("jsonl", "base64", "hex")
+
+
+def read_abi(path):
+    if path.startswith("https://") or path.startswith("http://"):
+        import requests
+        return requests.get(path).json()
+    with open(path, "rb") as f:
+        return json.load(f)
+
+
+def resolve_type(abi_json, name):
+    # An endpoint name decodes as its first output, anything else is used as a type as is
+    endpoint = next((endpoint for endpoint in abi_json.get("endpoints", []) if endpoint["name"] == name), None)
+    if endpoint is not None:
+        return endpoint["outputs"][0]["type"]
+    return name
+
+
+def read_chunks(input_file, chunk_size):
+    chunk = []
+    for line in input_file:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Progress:
+    def __init__(self, every=5.0):
+        self.every = every
+        self.started = self.reported = time.perf_counter()
+        self.lines = 0
+        self.bytes = 0
+
+    def add(self, lines, size):
+        self.lines += lines
+        self.bytes += size
+        if time.perf_counter() - self.reported >= self.every:
+            self.report()
+
+    def report(self, final=False):
+        self.reported = time.perf_counter()
+        elapsed = max(self.reported - self.started, 1e-9)
+        print(f"{'Decoded' if final else 'Decoding:'} {self.lines} payloads ({self.bytes / 1024 / 1024:.1f} MiB) "
+              f"in {elapsed:.1f}s, {self.lines / elapsed:.0f} payloads/s, {self.bytes / 1024 / 1024 / elapsed:.1f} MiB/s",
+              file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode base64 or hex returnData dumps with an ABI, on all cores.")
+    parser.add_argument("abi", help="ABI JSON file or URL")
+    parser.add_argument("type", help="Endpoint whose output type to decode, or an ABI type such as variadic<Offer>")
+    parser.add_argument("input", help="Input file with one payload per line, - for stdin")
+    parser.add_argument("--input-format", choices=INPUT_FORMATS, default="jsonl",
+                        help="jsonl: returnData list, {\"returnData\": [...]} or gateway response per line. "
+                             "base64/hex: the items of one payload separated by commas or spaces")
+    parser.add_argument("--out", help="Output JSON lines file, default is stdout")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Payloads sent to a worker at once")
+    parser.add_argument("--fields", help="Comma-separated struct fields to keep, nested as items.owner")
+    options = parser.parse_args()
+
+    abi_json = read_abi(options.abi)
+    response_type = resolve_type(abi_json, options.type)
+    projection = build_projection(options.fields) if options.fields else None
+    input_file = sys.stdin if options.input == "-" else open(options.input)
+    output = open(options.out, "w") if options.out else sys.stdout
+    progress = Progress()
+    # Chunks queued ahead of the writer, enough to keep every worker busy without reading the whole input
+    pending = deque()
+    first_line = 1
+    try:
+        with ProcessPoolExecutor(options.workers, initializer=init_worker,
+                                 initargs=({"cli": {"types": abi_json.get("types", {})}},)) as executor:
+            for chunk in read_chunks(input_file, options.chunk_size):
+                pending.append((len(chunk), sum(len(line) for line in chunk), executor.submit(
+                    decode_lines_in_worker, "cli", first_line, chunk, options.input_format, response_type, projection
+                )))
+                first_line += len(chunk)
+                if len(pending) >= options.workers * 2:
+                    lines, size, future = pending.popleft()
+                    output.write(future.result())
+                    progress.add(lines, size)
+            while pending:
+                lines, size, future = pending.popleft()
+                output.write(future.result())
+                progress.add(lines, size)
+    finally:
+        if options.input != "-":
+            input_file.close()
+        if options.out:
+            output.close()
+    progress.report(final=True)
+
+
+if __name__ == '__main__':
+    main()
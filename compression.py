@@ -0,0 +1,102 @@
+import asyncio
+import gzip
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {"gzip": lambda data: gzip.compress(data, compresslevel=6)}
+if brotli is not None:
+    COMPRESSORS["br"] = lambda data: brotli.compress(data, quality=5)
+if zstandard is not None:
+    COMPRESSORS["zstd"] = lambda data: zstandard.ZstdCompressor(level=3).compress(data)
+# Preferred encoding first when the client accepts several with the same weight
+PREFERENCE = ("zstd", "br", "gzip")
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/", "application/javascript", "application/msgpack",
+                          "application/cbor")
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        encoding, _, params = item.strip().partition(";")
+        weight = 1.0
+        if params.strip().startswith("q="):
+            try:
+                weight = float(params.strip()[2:])
+            except ValueError:
+                weight = 0.0
+        weights[encoding.strip().lower()] = weight
+    candidates = [
+        encoding for encoding in PREFERENCE
+        if encoding in COMPRESSORS and weights.get(encoding, weights.get("*", 0)) > 0
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda encoding: weights.get(encoding, weights.get("*", 0)))
+
+
+class VariantCache:
+    # LRU of compressed bodies, bounded by their number and their total size
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self.size = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: bytes) -> None:
+        if self.max_entries <= 0 or len(value) > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self.entries[key] = value
+        self.size += len(value)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, dropped = self.entries.popitem(last=False)
+            self.size -= len(dropped)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class ResponseCompressor:
+    def __init__(self, min_size: int = 1024, offload_size: int = 256 * 1024, cache_entries: int = 1000,
+                 cache_bytes: int = 64 * 1024 * 1024) -> None:
+        self.min_size = min_size
+        self.offload_size = offload_size
+        # Compressed variants of bodies that are sent again (cached results, the Swagger spec), compressed once
+        self.variants = VariantCache(cache_entries, cache_bytes)
+
+    def is_compressible(self, mimetype: Optional[str]) -> bool:
+        return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_MIMETYPES)
+
+    async def compress(self, data: bytes, encoding: str, reuse: bool = False) -> bytes:
+        # Only bodies likely to be sent again are hashed and kept, one-off responses are just compressed
+        key = (hashlib.blake2b(data, digest_size=16).digest(), encoding) if reuse else None
+        compressed = self.variants.get(key) if reuse else None
+        if compressed is None:
+            if len(data) >= self.offload_size:
+                compressed = await asyncio.to_thread(COMPRESSORS[encoding], data)
+            else:
+                compressed = COMPRESSORS[encoding](data)
+            if reuse:
+                self.variants.set(key, compressed)
+        return compressed
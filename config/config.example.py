@@ -13,6 +13,49 @@ ENVIRONMENTS = {
     "testnet": "https://testnet-gateway.multiversx.com"
 }
 PROXY_URL = ENVIRONMENTS[ENVIRONMENT]
+CACHE_TTL = 0
+ERROR_CACHE_TTL = 5
+CACHE_SIZE = 10000
+HISTORICAL_CACHE_SIZE = 10000
+RESULT_STORE_PATH = None
+RESULT_STORE_MAX_BYTES = 256 * 1024 * 1024
+RATE_LIMIT = None
+API_KEYS = []
+MAX_IN_FLIGHT = 0
+GATEWAY_RETRIES = 1
+MAX_GATEWAY_RESPONSE_SIZE = 64 * 1024 * 1024
+SERVER_TIMING = False
+TRACE_FILE = None
+ADMIN_TOKEN = None
+BUILD_DIR = "build"
+ADDRESS_GROUPS = {}
+FANOUT_CONCURRENCY = 16
+MAX_FANOUT_ADDRESSES = 1000
+MAX_BATCH_QUERIES = 100
+MAX_EXPORT_ARGS = 1000
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_OFFLOAD_SIZE = 256 * 1024
+COMPRESSION_CACHE_SIZE = 1000
+COMPRESSION_CACHE_BYTES = 64 * 1024 * 1024
+DECODE_POOL = "process"
+DECODE_WORKERS = None
+DECODE_OFFLOAD_SIZE = 512 * 1024
+METRICS_ENABLED = True
+LOOP_LAG_INTERVAL = 0.1
+LOOP_LAG_THRESHOLD = 0.25
+GATEWAY_CONNECTIONS = 100
+WARMUP_CONNECTIONS = 4
+HEDGE_MAX_RATIO = 0.05
+HEDGE_PERCENTILE = 0.95
+HEDGE_GATEWAYS = []
+GATEWAY_RECORD_PATH = None
+GATEWAY_REPLAY_PATH = None
+GATEWAY_REPLAY_MODE = "replay"
+GATEWAY_REPLAY_TIMING = False
+MAX_COMPILED_APPS = 0
+HISTORY_PATH = None
+UPSTREAM_CONCURRENCY = 100
+UPSTREAM_APP_CONCURRENCY = 0
 SIZE_PER_TYPE = {
     "i8": 1,
     "i16": 2,
@@ -0,0 +1,143 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+from TypeParser import ABITypeParser
+
+WORKER_PARSERS: Dict[str, ABITypeParser] = {}
+
+
+def init_worker(contexts: Dict[str, Dict[str, Any]]) -> None:
+    for abi_key, abi_json in contexts.items():
+        WORKER_PARSERS[abi_key] = ABITypeParser(abi_json)
+
+
+def ping_worker() -> int:
+    return len(WORKER_PARSERS)
+
+
+def decode_in_worker(abi_key: str, abi_json: Optional[Dict[str, Any]], return_data: List[str], response_type: str,
+                     projection: Optional[Dict[str, Any]] = None) -> Any:
+    parser = WORKER_PARSERS.get(abi_key)
+    if parser is None:
+        parser = WORKER_PARSERS[abi_key] = ABITypeParser(abi_json)
+    decoded = [base64.b64decode(item) for item in return_data]
+    return parser.parse_hex_response(decoded, response_type, projection)
+
+
+def parse_payload(line: str, input_format: str) -> List[bytes]:
+    # One payload per line: a JSON returnData list, {"returnData": [...]} or a gateway response for "jsonl",
+    # otherwise the items separated by commas or whitespace
+    if input_format == "jsonl":
+        value = json.loads(line)
+        if isinstance(value, dict):
+            if isinstance(value.get("data"), dict) and isinstance(value["data"].get("data"), dict):
+                value = value["data"]["data"]
+            value = value.get("returnData")
+        return [base64.b64decode(item) for item in value or []]
+    items = [item for item in re.split(r"[\s,]+", line) if item]
+    if input_format == "hex":
+        return [bytes.fromhex(item) for item in items]
+    return [base64.b64decode(item) for item in items]
+
+
+def decode_lines_in_worker(abi_key: str, first_line: int, lines: List[str], input_format: str, response_type: str,
+                           projection: Optional[Dict[str, Any]] = None) -> str:
+    # Returns the JSON lines of the results, so serializing them also runs in the worker
+    parser = WORKER_PARSERS[abi_key]
+    output = []
+    for number, line in enumerate(lines, first_line):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = {"line": number, "data": parser.parse_hex_response(parse_payload(line, input_format), response_type,
+                                                                     projection)}
+        except Exception as e:
+            row = {"line": number, "error": str(e)}
+        output.append(json.dumps(row, separators=(",", ":"), default=str))
+    return "".join(row + "\n" for row in output)
+
+
+class DecodePool:
+    def __init__(self, kind: Optional[str] = "process", workers: Optional[int] = None,
+                 offload_size: int = 512 * 1024) -> None:
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.offload_size = offload_size
+        self.contexts: Dict[str, Dict[str, Any]] = {}
+        self.keys: Dict[int, tuple] = {}
+        self.preloaded: set = set()
+        self.executor: Optional[Executor] = None
+
+    def abi_key(self, abi_json: Dict[str, Any]) -> str:
+        entry = self.keys.get(id(abi_json))
+        if entry is None or entry[0] is not abi_json:
+            types = abi_json.get("types", {})
+            abi_key = hashlib.sha1(json.dumps(types, sort_keys=True).encode()).hexdigest()
+            entry = self.keys[id(abi_json)] = (abi_json, abi_key)
+            self.contexts.setdefault(abi_key, {"types": types})
+        return entry[1]
+
+    def register(self, abi_json: Dict[str, Any]) -> None:
+        # ABIs registered before the pool starts are loaded once per worker instead of sent with every task
+        self.abi_key(abi_json)
+
+    def forget(self, abi_json: Dict[str, Any]) -> None:
+        # The worker side parser stays, it is keyed by the types and is reused if the ABI is compiled again
+        entry = self.keys.get(id(abi_json))
+        if entry is not None and entry[0] is abi_json:
+            del self.keys[id(abi_json)]
+            if all(abi_key != entry[1] for _, abi_key in self.keys.values()):
+                # Workers started later no longer load it, so it is sent with the task if the ABI comes back
+                self.contexts.pop(entry[1], None)
+                self.preloaded.discard(entry[1])
+
+    def should_offload(self, return_data: Optional[List[str]]) -> bool:
+        if not self.kind or not return_data:
+            return False
+        return sum(len(item) for item in return_data) >= self.offload_size
+
+    def get_executor(self) -> Executor:
+        if self.executor is None:
+            self.preloaded = set(self.contexts)
+            if self.kind == "thread":
+                self.executor = ThreadPoolExecutor(self.workers, initializer=init_worker, initargs=(self.contexts,))
+            else:
+                self.executor = ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(self.contexts,))
+        return self.executor
+
+    async def decode(self, abi_json: Dict[str, Any], return_data: List[str], response_type: str,
+                     projection: Optional[Dict[str, Any]] = None) -> Any:
+        abi_key = self.abi_key(abi_json)
+        executor = self.get_executor()
+        context = None if abi_key in self.preloaded else self.contexts[abi_key]
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, decode_in_worker, abi_key, context, return_data, response_type, projection
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for its memory use). The payload may be the cause, so it is not retried,
+            # the request fails and the next decode starts a fresh pool.
+            if self.executor is executor:
+                self.executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise RuntimeError("Decode worker crashed while decoding the response")
+
+    async def warm_up(self) -> None:
+        # Starts the workers and loads the ABIs into them before the first large payload arrives
+        if not self.kind:
+            return
+        loop = asyncio.get_running_loop()
+        executor = self.get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, ping_worker) for _ in range(self.workers)))
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Tuple
+from scheduler import set_upstream_context
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+# Rows kept back to find the CSV columns when the first results are errors
+CSV_HEADER_ROWS = 1000
+
+
+def iter_jobs(addresses: Iterable[str], arg_sets: Callable[[], Iterable[Dict[str, Any]]]) -> Iterator[Tuple[str, Dict]]:
+    # arg_sets is called once per address so both can be read lazily from files
+    for address in addresses:
+        for values in arg_sets():
+            yield address, values
+
+
+async def run_export(jobs: Iterable[Tuple[str, Dict]], query, concurrency: int = 16) -> AsyncIterator[Dict[str, Any]]:
+    # At most `concurrency` queries run ahead of the consumer, so a slow client slows the export down
+    # instead of results piling up in memory. Rows come out in job order.
+    pending = deque()
+    try:
+        for address, values in jobs:
+            pending.append((address, values, asyncio.ensure_future(query(address, values))))
+            if len(pending) >= concurrency:
+                yield await result_row(*pending.popleft())
+        while pending:
+            yield await result_row(*pending.popleft())
+    finally:
+        for _, _, task in pending:
+            task.cancel()
+
+
+async def result_row(address: str, values: Dict[str, Any], task) -> Dict[str, Any]:
+    code, output = await task
+    if code != 200:
+        return {"address": address, "args": values, "error": output, "code": code}
+    return {"address": address, "args": values, "data": output}
+
+
+def flatten(value: Any, prefix: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    # Struct fields become dotted columns, lists that are not expanded into rows are kept as JSON
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flatten(item, f"{prefix}.{key}" if prefix else key, row)
+    elif isinstance(value, list):
+        row[prefix] = json.dumps(value)
+    else:
+        row[prefix] = value
+    return row
+
+
+def csv_rows(row: Dict[str, Any]) -> List[Dict[str, Any]]:
+    base = flatten(row["args"], "args", {"address": row["address"]})
+    if "error" in row:
+        return [dict(base, error=row["error"])]
+    # A view returning a list gives one CSV row per item
+    items = row["data"] if isinstance(row["data"], list) else [row["data"]]
+    return [flatten(item, "data", dict(base)) for item in items]
+
+
+async def ndjson_lines(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    async for row in rows:
+        yield json.dumps(row, separators=(",", ":")) + "\n"
+
+
+async def csv_lines(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    # The columns are those of the first decoded row, columns only later rows have are dropped
+    buffer = io.StringIO()
+    writer = None
+    held = []
+    async for row in rows:
+        lines = csv_rows(row)
+        if writer is None:
+            held.extend(lines)
+            # Errors and views that returned an empty list give no columns, wait for a decoded row
+            first = next((line for line in lines if "error" not in line), None)
+            if first is None and len(held) < CSV_HEADER_ROWS:
+                continue
+            columns = list(first or held[0])
+            writer = csv.DictWriter(buffer, columns + ["error"] if "error" not in columns else columns,
+                                    extrasaction="ignore")
+            writer.writeheader()
+            lines, held = held, []
+        writer.writerows(lines)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if writer is None and held:
+        writer = csv.DictWriter(buffer, list(held[0]), extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(held)
+        yield buffer.getvalue()
+
+
+def export_lines(rows: AsyncIterator[Dict[str, Any]], export_format: str) -> AsyncIterator[str]:
+    return csv_lines(rows) if export_format == "csv" else ndjson_lines(rows)
+
+
+def read_lines(path: str) -> Iterator[str]:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield line.strip()
+
+
+async def export_to(output, app_name: str, endpoint_name: str, block: Dict[str, str], options) -> None:
+    import api
+    from ParseABI import close_session
+    set_upstream_context(app_name, "bulk")
+    query = api.export_query(app_name, endpoint_name, block=block, fields=options.fields)
+    addresses = read_lines(options.addresses) if options.addresses else [api.CONFIG_DICT[app_name]["SCADDRESS"]]
+    if options.args_file:
+        arg_sets = lambda: (api.normalize_values(json.loads(line)) for line in read_lines(options.args_file))
+    else:
+        arg_sets = lambda: [{}]
+    try:
+        async for line in export_lines(run_export(iter_jobs(addresses, arg_sets), query, options.concurrency),
+                                       options.format):
+            output.write(line)
+    finally:
+        await close_session()
+
+
+def main():
+    import api
+    parser = argparse.ArgumentParser(description="Export the results of a readonly view as NDJSON or CSV.")
+    parser.add_argument("app", help="NAME of the APIS entry")
+    parser.add_argument("endpoint", help="Readonly endpoint to query")
+    parser.add_argument("--args-file", help="JSON lines file with one object of endpoint arguments per line")
+    parser.add_argument("--addresses", help="File with one contract address per line, default is the app's SCADDRESS")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--concurrency", type=int, default=16, help="Queries running at the same time")
+    parser.add_argument("--fields", help="Comma-separated struct fields to export")
+    parser.add_argument("--blockNonce", help="Export the contract state as of this block nonce")
+    parser.add_argument("--blockHash", help="Export the contract state as of this block hash")
+    parser.add_argument("--out", help="Output file, default is stdout")
+    options = parser.parse_args()
+    process = next((process for process in api.APIS if process["NAME"] == options.app), None)
+    if process is None:
+        sys.exit(f"Unknown app: {options.app}")
+    api.setup_app(process, api.load_abi(process["ABI_PATH"]))
+    if options.endpoint not in api.CONFIG_DICT[options.app].meta.endpoint_names:
+        sys.exit(f"Unknown readonly endpoint: {options.endpoint}")
+    block = api.get_block_options(vars(options))
+    if isinstance(block, tuple):
+        sys.exit(block[1])
+    output = open(options.out, "w", newline="") if options.out else sys.stdout
+    try:
+        asyncio.run(export_to(output, options.app, options.endpoint, block, options))
+    finally:
+        if options.out:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
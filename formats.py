@@ -0,0 +1,58 @@
+import base64
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+# Formats returning gateway returnData as is, without ABI decoding
+UNDECODED_FORMATS = ("raw", "hex")
+BINARY_SERIALIZERS: Dict[str, Callable[[Any], bytes]] = {}
+MIMETYPES = {
+    "msgpack": "application/msgpack",
+    "cbor": "application/cbor"
+}
+PACKAGES = {
+    "msgpack": "msgpack",
+    "cbor": "cbor2"
+}
+if msgpack is not None:
+    BINARY_SERIALIZERS["msgpack"] = lambda value: msgpack.packb(value, use_bin_type=True)
+if cbor2 is not None:
+    BINARY_SERIALIZERS["cbor"] = cbor2.dumps
+ACCEPTED_MIMETYPES = {
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+    "application/cbor": "cbor"
+}
+
+
+def get_output_format(format_param: Optional[str], accept: Optional[str]):
+    # Returns the format name, or (code, message) when it is unknown or its package is missing
+    if format_param:
+        output_format = format_param.lower()
+        if output_format in ("json",) + UNDECODED_FORMATS:
+            return output_format
+        if output_format in MIMETYPES:
+            if output_format not in BINARY_SERIALIZERS:
+                return 406, f"Format {output_format} requires the optional '{PACKAGES[output_format]}' package"
+            return output_format
+        return 400, f"Unknown format: {format_param}"
+    for item in (accept or "").split(","):
+        output_format = ACCEPTED_MIMETYPES.get(item.split(";")[0].strip().lower())
+        if output_format in BINARY_SERIALIZERS:
+            return output_format
+    return "json"
+
+
+def encode_return_data(return_data, output_format):
+    if output_format == "hex":
+        return [base64.b64decode(item).hex() for item in return_data]
+    return list(return_data)
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+import metrics
+
+metrics.register("abi2api_gateway_hedges_total", "counter", "Hedged duplicate gateway requests sent")
+metrics.register("abi2api_gateway_hedge_wins_total", "counter", "Hedged gateway requests that answered first")
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 500, refresh_every: int = 20) -> None:
+        self.window = window
+        self.refresh_every = refresh_every
+        self.samples: Dict[str, deque] = {}
+        self.pending: Dict[str, int] = {}
+        self.sorted: Dict[str, List[float]] = {}
+
+    def record(self, key: str, seconds: float) -> None:
+        samples = self.samples.get(key)
+        if samples is None:
+            samples = self.samples[key] = deque(maxlen=self.window)
+        samples.append(seconds)
+        self.pending[key] = self.pending.get(key, 0) + 1
+
+    def percentile(self, key: str, q: float, min_samples: int = 20) -> Optional[float]:
+        samples = self.samples.get(key)
+        if samples is None or len(samples) < min_samples:
+            return None
+        # Sorting the window on every request is wasteful, the percentile moves slowly
+        if key not in self.sorted or self.pending[key] >= self.refresh_every:
+            self.sorted[key] = sorted(samples)
+            self.pending[key] = 0
+        ordered = self.sorted[key]
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Hedger:
+    def __init__(self, gateways: List[str], percentile: float = 0.95, max_ratio: float = 0.05,
+                 min_delay: float = 0.01) -> None:
+        self.gateways = gateways
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.min_delay = min_delay
+        self.latency = LatencyTracker()
+        # Every request adds max_ratio to the budget, every hedge spends 1
+        self.budget = 0.0
+        self.next_gateway = 0
+
+    def enabled(self) -> bool:
+        return self.max_ratio > 0
+
+    def hedge_gateway(self) -> str:
+        self.next_gateway = (self.next_gateway + 1) % len(self.gateways)
+        return self.gateways[self.next_gateway]
+
+    async def timed(self, key: str, call, gateway: str):
+        started = time.perf_counter()
+        try:
+            answer = await call(gateway)
+        except asyncio.CancelledError:
+            # The slow loser of a hedged pair, its elapsed time is a lower bound of its latency.
+            # Leaving it out would pull the percentile down and make hedging fire more often.
+            self.latency.record(key, time.perf_counter() - started)
+            raise
+        if not (isinstance(answer, tuple) and "timed out" in str(answer[1])):
+            self.latency.record(key, time.perf_counter() - started)
+        return answer
+
+    async def hedged(self, key: str, call, release) -> Any:
+        try:
+            return await self.timed(key, call, self.hedge_gateway())
+        finally:
+            release()
+
+    async def run(self, key: str, call, try_slot=None):
+        # call(gateway) must be idempotent, the slower of the two requests is cancelled.
+        # try_slot() returns a release function when the hedge may take a gateway slot, otherwise None.
+        if not self.enabled():
+            return await call(self.gateways[0])
+        self.budget = min(self.budget + self.max_ratio, 10.0)
+        primary = asyncio.ensure_future(self.timed(key, call, self.gateways[0]))
+        tasks = [primary]
+        try:
+            delay = self.latency.percentile(key, self.percentile)
+            if delay is None or self.budget < 1:
+                return await primary
+            done, _ = await asyncio.wait({primary}, timeout=max(delay, self.min_delay))
+            if done:
+                return primary.result()
+            release = try_slot() if try_slot is not None else (lambda: None)
+            if release is None:
+                # Every gateway slot is taken, a hedge would only add load
+                return await primary
+            self.budget -= 1
+            metrics.inc("abi2api_gateway_hedges_total", endpoint=key)
+            hedge = asyncio.ensure_future(self.hedged(key, call, release))
+            tasks.append(hedge)
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    answer = task.result()
+                    # An error from one request still leaves the other a chance to succeed
+                    if not isinstance(answer, tuple) or answer[0] == 400 or not pending:
+                        if task is hedge:
+                            metrics.inc("abi2api_gateway_hedge_wins_total", endpoint=key)
+                        return answer
+        finally:
+            # Also runs when the caller is cancelled (client gone, timeout), asyncio.wait leaves its tasks running
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import random
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+from scheduler import set_upstream_context
+
+
+def series_key(app_name: str, sc_address: str, endpoint_name: str, values: Dict[str, str]) -> str:
+    args = {name: value for name, value in sorted(values.items()) if value != ''}
+    return json.dumps([app_name, sc_address, endpoint_name, args], separators=(",", ":"))
+
+
+class HistoryStore:
+    # Append-only: a value is only written when it differs from the last one of its series
+    def __init__(self, path: str) -> None:
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS history (series TEXT NOT NULL, timestamp REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS history_series_timestamp ON history (series, timestamp)")
+        self.connection.commit()
+        self.last_values: Dict[str, str] = {}
+
+    def last_value(self, series: str) -> Optional[str]:
+        if series not in self.last_values:
+            row = self.connection.execute(
+                "SELECT value FROM history WHERE series = ? ORDER BY timestamp DESC LIMIT 1", (series,)
+            ).fetchone()
+            self.last_values[series] = row[0] if row else None
+        return self.last_values[series]
+
+    def append(self, series: str, value: Any, timestamp: Optional[float] = None) -> bool:
+        serialized = json.dumps(value, sort_keys=True, separators=(",", ":"))
+        if serialized == self.last_value(series):
+            return False
+        self.connection.execute(
+            "INSERT INTO history (series, timestamp, value) VALUES (?, ?, ?)",
+            (series, timestamp if timestamp is not None else time.time(), serialized)
+        )
+        self.connection.commit()
+        self.last_values[series] = serialized
+        return True
+
+    def range(self, series: str, start: float = 0, end: Optional[float] = None,
+              limit: int = 1000) -> List[Dict[str, Any]]:
+        # The value in effect at `start` is included, so a chart of the range starts at the right level
+        points = []
+        row = self.connection.execute(
+            "SELECT timestamp, value FROM history WHERE series = ? AND timestamp < ? ORDER BY timestamp DESC LIMIT 1",
+            (series, start)
+        ).fetchone()
+        if row:
+            points.append(row)
+        points.extend(self.connection.execute(
+            "SELECT timestamp, value FROM history WHERE series = ? AND timestamp >= ? AND timestamp <= ? "
+            "ORDER BY timestamp LIMIT ?",
+            (series, start, end if end is not None else float("inf"), limit - len(points))
+        ))
+        return [{"timestamp": timestamp, "value": json.loads(value)} for timestamp, value in points]
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class HistoryPoller:
+    def __init__(self, store: HistoryStore, views: List[Dict[str, Any]]) -> None:
+        # views: {"app", "series", "interval", "query"} where query() returns (code, output)
+        self.store = store
+        self.views = views
+        self.tasks: List[asyncio.Task] = []
+
+    async def poll(self, view: Dict[str, Any]) -> None:
+        set_upstream_context(view.get("app"), "bulk")
+        # Random start offsets keep views with the same interval from hitting the gateway together
+        await asyncio.sleep(random.uniform(0, view["interval"]))
+        while True:
+            started = time.monotonic()
+            try:
+                code, output = await view["query"]()
+                if code == 200:
+                    self.store.append(view["series"], output)
+                else:
+                    print(f"History poll of {view['series']} failed: {output}")
+            except Exception as e:
+                print(f"History poll of {view['series']} failed: {e}")
+            await asyncio.sleep(max(0.0, view["interval"] - (time.monotonic() - started)))
+
+    def start(self) -> None:
+        self.tasks = [asyncio.ensure_future(self.poll(view)) for view in self.views]
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
@@ -0,0 +1,77 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+import weakref
+from typing import Any, Dict, Optional
+import metrics
+
+# Request being handled by each task, so a stalled loop can be traced back to an endpoint and its arguments
+REQUEST_INFO: "weakref.WeakKeyDictionary[asyncio.Task, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+metrics.register("abi2api_event_loop_lag_seconds", "gauge", "Delay of the last event loop lag probe")
+metrics.register("abi2api_event_loop_max_lag_seconds", "gauge", "Largest event loop lag seen since startup")
+metrics.register("abi2api_event_loop_stalls_total", "counter", "Times the event loop was blocked beyond the threshold")
+
+
+def track_request(name: str, args: Dict[str, Any]) -> None:
+    task = asyncio.current_task()
+    if task is not None:
+        REQUEST_INFO[task] = {"endpoint": name, "args": args}
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.max_lag = 0.0
+        self.heartbeat = time.monotonic()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread_id: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+        self.stopped = threading.Event()
+        self.watchdog = threading.Thread(target=self.watch, name="loop-watchdog", daemon=True)
+
+    async def probe(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.heartbeat = time.monotonic()
+            lag = max(self.heartbeat - started - self.interval, 0)
+            self.max_lag = max(self.max_lag, lag)
+            metrics.set_gauge("abi2api_event_loop_lag_seconds", round(lag, 6))
+            metrics.set_gauge("abi2api_event_loop_max_lag_seconds", round(self.max_lag, 6))
+
+    def watch(self) -> None:
+        reported = False
+        while not self.stopped.wait(self.threshold / 2):
+            stalled_for = time.monotonic() - self.heartbeat - self.interval
+            if stalled_for < self.threshold:
+                reported = False
+                continue
+            if not reported:
+                reported = True
+                metrics.inc("abi2api_event_loop_stalls_total")
+                self.report(stalled_for)
+
+    def report(self, stalled_for: float) -> None:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        task = asyncio.current_task(self.loop)
+        info = REQUEST_INFO.get(task) if task is not None else None
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "unavailable\n"
+        print(f"Event loop blocked for {stalled_for:.3f}s while running "
+              f"{info['endpoint'] if info else task!r} with args {info['args'] if info else {}}\n{stack}",
+              file=sys.stderr)
+
+    def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.task = self.loop.create_task(self.probe())
+        self.watchdog.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
@@ -0,0 +1,38 @@
+import threading
+from typing import Dict, Tuple
+
+METRICS: Dict[str, dict] = {}
+LOCK = threading.Lock()
+
+
+def register(name: str, metric_type: str, description: str) -> None:
+    METRICS.setdefault(name, {"type": metric_type, "help": description, "samples": {}})
+
+
+def label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def set_gauge(name: str, value: float, **labels: str) -> None:
+    with LOCK:
+        METRICS[name]["samples"][label_key(labels)] = value
+
+
+def inc(name: str, amount: float = 1, **labels: str) -> None:
+    with LOCK:
+        samples = METRICS[name]["samples"]
+        key = label_key(labels)
+        samples[key] = samples.get(key, 0) + amount
+
+
+def render() -> str:
+    # Prometheus text exposition format
+    lines = []
+    with LOCK:
+        for name, metric in METRICS.items():
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for labels, value in metric["samples"].items():
+                label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
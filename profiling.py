@@ -0,0 +1,134 @@
+import asyncio
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+# cProfile and tracemalloc each have one process-wide hook, so only one session runs at a time
+PROFILING_LOCK = asyncio.Lock()
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005) -> None:
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="sampling-profiler", daemon=True)
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def collapsed(self) -> str:
+        # One "frame;frame;frame count" line per stack, the input format of flamegraph.pl and speedscope
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+def pstats_text(profile: cProfile.Profile, limit: int = 50) -> str:
+    output = io.StringIO()
+    pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
+
+
+def pstats_dump(profile: cProfile.Profile) -> bytes:
+    # Same content as Profile.dump_stats(), loadable with pstats.Stats(path) or snakeviz
+    profile.create_stats()
+    return marshal.dumps(profile.stats)
+
+
+def profiling_busy() -> bool:
+    return PROFILING_LOCK.locked()
+
+
+async def profile_loop(seconds: float, mode: str = "sample"):
+    async with PROFILING_LOCK:
+        return await run_profile_loop(seconds, mode)
+
+
+async def run_profile_loop(seconds: float, mode: str):
+    if mode == "sample":
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+        return profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+    return profiler
+
+
+async def profile_call(call, mode: str = "sample"):
+    async with PROFILING_LOCK:
+        return await run_profile_call(call, mode)
+
+
+async def run_profile_call(call, mode: str):
+    profiler = SamplingProfiler() if mode == "sample" else cProfile.Profile()
+    if mode == "sample":
+        profiler.start()
+    else:
+        profiler.enable()
+    try:
+        result = await call()
+    finally:
+        if mode == "sample":
+            profiler.stop()
+        else:
+            profiler.disable()
+    return result, profiler
+
+
+def render_profile(profiler, output: str = "text"):
+    # Returns (body, mimetype)
+    if isinstance(profiler, SamplingProfiler):
+        return profiler.collapsed(), "text/plain"
+    if output == "pstats":
+        return pstats_dump(profiler), "application/octet-stream"
+    return pstats_text(profiler), "text/plain"
+
+
+async def memory_diff(seconds: float, limit: int = 30, group_by: str = "lineno") -> str:
+    async with PROFILING_LOCK:
+        return await run_memory_diff(seconds, limit, group_by)
+
+
+async def run_memory_diff(seconds: float, limit: int, group_by: str) -> str:
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(25)
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+    lines = [f"Top {limit} allocation differences over {seconds}s grouped by {group_by}:"]
+    lines.extend(str(stat) for stat in after.compare_to(before, group_by)[:limit])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,90 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Collection, Dict, Optional, Tuple
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1) -> float:
+        # Returns 0 when the tokens were taken, otherwise the seconds until enough are available.
+        # A cost above the burst is allowed on a full bucket and leaves it in debt for the rest.
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = min(cost, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= cost
+            return 0
+        return (needed - self.tokens) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, default_limit: Optional[Dict[str, float]] = None, max_clients: int = 100000) -> None:
+        self.default_limit = default_limit
+        self.max_clients = max_clients
+        self.app_limits: Dict[str, Dict[str, float]] = {}
+        self.endpoint_limits: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self.buckets: "OrderedDict[Tuple[str, Optional[str], str], TokenBucket]" = OrderedDict()
+
+    def configure_app(self, app_name: str, app_limit: Optional[Dict[str, float]] = None,
+                      endpoint_limits: Optional[Dict[str, Dict[str, float]]] = None) -> None:
+        if app_limit:
+            self.app_limits[app_name] = app_limit
+        if endpoint_limits:
+            self.endpoint_limits[app_name] = endpoint_limits
+
+    def remove_app(self, app_name: str) -> None:
+        self.app_limits.pop(app_name, None)
+        self.endpoint_limits.pop(app_name, None)
+        for key in [key for key in self.buckets if key[0] == app_name]:
+            del self.buckets[key]
+
+    def check(self, app_name: str, endpoint_name: str, client: str, cost: float = 1) -> int:
+        # Returns 0 when the request is allowed, otherwise the Retry-After value in whole seconds.
+        # cost is the number of gateway queries the request makes.
+        endpoint_limit = self.endpoint_limits.get(app_name, {}).get(endpoint_name)
+        if endpoint_limit:
+            key, limit = (app_name, endpoint_name, client), endpoint_limit
+        else:
+            limit = self.app_limits.get(app_name, self.default_limit)
+            if not limit:
+                return 0
+            key = (app_name, None, client)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(limit["rate"], limit.get("burst", limit["rate"]))
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        wait = bucket.take(cost)
+        return math.ceil(wait) if wait else 0
+
+
+class InFlightLimiter:
+    def __init__(self, max_in_flight: int = 0) -> None:
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+    def acquire(self) -> bool:
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+
+def client_key(request: Any, api_keys: Optional[Collection[str]] = None) -> str:
+    # Only known keys get their own bucket, otherwise rotating the header would skip the limit
+    api_key = request.headers.get("X-API-Key")
+    if api_key and api_keys and api_key in api_keys:
+        return f"key:{api_key}"
+    return f"ip:{request.remote_addr}"
@@ -0,0 +1,109 @@
+import asyncio
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+def request_key(body: Dict[str, Any], block: Optional[Dict[str, str]]) -> str:
+    return json.dumps([body, block or None], sort_keys=True, separators=(",", ":"))
+
+
+class GatewayRecorder:
+    # Appends one JSON line per gateway call to a gzip file, each open adds a new gzip member.
+    # The event loop only queues the entries, a writer thread serializes and compresses them.
+    def __init__(self, path: str, flush_every: int = 100, max_queued: int = 10000) -> None:
+        self.path = path
+        self.flush_every = flush_every
+        self.queue: queue.Queue = queue.Queue(max_queued)
+        self.dropped = 0
+        self.thread: Optional[threading.Thread] = None
+
+    def record(self, body: Dict[str, Any], block: Optional[Dict[str, str]], answer: Any, elapsed: float) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="gateway-recorder", daemon=True)
+            self.thread.start()
+        try:
+            self.queue.put_nowait((body, block, answer, time.time(), elapsed))
+        except queue.Full:
+            # A stalled disk must not block queries, the recording misses these
+            self.dropped += 1
+
+    def run(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        appending = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        # A low level keeps up with busy gateways, recordings compress well anyway
+        with gzip.open(self.path, "at", encoding="utf-8", compresslevel=1) as file:
+            if appending:
+                # Ends a line the previous run may have left unfinished, so the first entry is not lost with it
+                file.write("\n")
+            unflushed = 0
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    return
+                body, block, answer, at, elapsed = item
+                entry = {"key": request_key(body, block), "at": round(at, 3), "elapsed": round(elapsed, 6)}
+                if isinstance(answer, tuple):
+                    entry["error"] = list(answer)
+                else:
+                    entry["data"] = answer
+                file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                unflushed += 1
+                if unflushed >= self.flush_every or self.queue.empty():
+                    file.flush()
+                    unflushed = 0
+
+    def close(self) -> None:
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+class GatewayReplay:
+    # mode "replay" serves every query from the recording, "fallback" only when the gateway fails
+    def __init__(self, path: str, mode: str = "replay", timing: bool = False) -> None:
+        self.mode = mode
+        self.timing = timing
+        self.entries: Dict[str, List[Dict[str, Any]]] = {}
+        self.position: Dict[str, int] = {}
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Last line of a recording that was not closed cleanly
+                    continue
+                self.entries.setdefault(entry["key"], []).append(entry)
+        print(f"Loaded {sum(len(entries) for entries in self.entries.values())} recorded gateway responses "
+              f"from {path}")
+
+    def lookup(self, body: Dict[str, Any], block: Optional[Dict[str, str]], successful: bool = False):
+        entries = self.entries.get(request_key(body, block))
+        if not entries:
+            return None
+        if successful:
+            entries = [entry for entry in entries if "error" not in entry] or None
+            if entries is None:
+                return None
+        # Repeated queries walk through the recorded answers in order, then start over
+        key = request_key(body, block)
+        index = self.position.get(key, 0)
+        self.position[key] = index + 1
+        return entries[index % len(entries)]
+
+    async def answer(self, body: Dict[str, Any], block: Optional[Dict[str, str]], successful: bool = False):
+        entry = self.lookup(body, block, successful)
+        if entry is None:
+            return None
+        if self.timing:
+            await asyncio.sleep(entry["elapsed"])
+        if "error" in entry:
+            return tuple(entry["error"])
+        return entry["data"]
@@ -0,0 +1,99 @@
+import sys
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Optional
+
+# Keys of an app config that only exist once its ABI is compiled
+COMPILED_KEYS = ("abi_json", "types", "endpoints", "readonly_endpoints", "endpoint_index", "swagger")
+INTERNED_KEYS = ("name", "type")
+
+
+class AppMeta:
+    # What is kept for every configured app, the ABI itself stays compressed until the app is used
+    __slots__ = ("name", "sc_address", "abi_hash", "endpoint_names", "abi_blob")
+
+    def __init__(self, name: str, sc_address: str, abi_hash: str, endpoint_names: FrozenSet[str],
+                 abi_blob: bytes) -> None:
+        self.name = name
+        self.sc_address = sc_address
+        self.abi_hash = abi_hash
+        self.endpoint_names = endpoint_names
+        self.abi_blob = abi_blob
+
+
+class AppConfig:
+    # Dict-like CONFIG_DICT entry, compiled keys are looked up in the registry and compiled on first access
+    __slots__ = ("meta", "registry", "settings")
+
+    def __init__(self, meta: AppMeta, registry: "ABIRegistry") -> None:
+        self.meta = meta
+        self.registry = registry
+        self.settings: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "SCADDRESS":
+            return self.meta.sc_address
+        if key in COMPILED_KEYS:
+            return self.registry.compiled(self.meta)[key]
+        return self.settings[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in COMPILED_KEYS:
+            self.registry.compiled(self.meta)[key] = value
+        else:
+            self.settings[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        if key == "SCADDRESS":
+            return True
+        if key in COMPILED_KEYS:
+            return key in self.registry.compiled(self.meta)
+        return key in self.settings
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+
+def intern_abi(value: Any) -> Any:
+    # Type and field names repeat across endpoints and apps, interned they are stored once
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in INTERNED_KEYS and isinstance(item, str):
+                value[key] = sys.intern(item)
+            else:
+                intern_abi(item)
+    elif isinstance(value, list):
+        for item in value:
+            intern_abi(item)
+    return value
+
+
+class ABIRegistry:
+    def __init__(self, compile_app: Callable[[AppMeta], Dict[str, Any]], max_compiled: int = 0,
+                 on_evict: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+        self.compile_app = compile_app
+        self.max_compiled = max_compiled
+        self.on_evict = on_evict
+        self.apps: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def compiled(self, meta: AppMeta) -> Dict[str, Any]:
+        compiled = self.apps.get(meta.name)
+        if compiled is None:
+            compiled = self.install(meta.name, self.compile_app(meta))
+        else:
+            self.apps.move_to_end(meta.name)
+        return compiled
+
+    def install(self, name: str, compiled: Dict[str, Any]) -> Dict[str, Any]:
+        self.apps[name] = compiled
+        self.apps.move_to_end(name)
+        while self.max_compiled and len(self.apps) > self.max_compiled:
+            self.evict(next(iter(self.apps)))
+        return compiled
+
+    def evict(self, name: str) -> None:
+        compiled = self.apps.pop(name, None)
+        if compiled is not None and self.on_evict is not None:
+            self.on_evict(compiled)
+
+    def is_compiled(self, name: str) -> bool:
+        return name in self.apps
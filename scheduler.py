@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Callable, Deque, Dict, Optional, Tuple
+import metrics
+
+# Interactive requests are always dispatched before bulk ones
+PRIORITIES = ("interactive", "bulk")
+UPSTREAM_CONTEXT: ContextVar = ContextVar("upstream_context", default=("", "interactive"))
+
+metrics.register("abi2api_upstream_in_flight", "gauge", "Gateway queries running per app")
+metrics.register("abi2api_upstream_queue_depth", "gauge", "Gateway queries waiting for a slot per app and priority")
+metrics.register("abi2api_upstream_queued_total", "counter", "Gateway queries that had to wait for a slot")
+metrics.register("abi2api_upstream_wait_seconds_total", "counter", "Time gateway queries spent waiting for a slot")
+
+
+def set_upstream_context(app_name: Optional[str], priority: Optional[str] = None) -> None:
+    # Gateway queries made by the current task (and tasks it starts) are scheduled for this app and priority
+    UPSTREAM_CONTEXT.set((app_name or "", priority if priority in PRIORITIES else "interactive"))
+
+
+class UpstreamScheduler:
+    def __init__(self, concurrency: int = 100, app_concurrency: int = 0) -> None:
+        self.concurrency = concurrency
+        self.app_concurrency = app_concurrency
+        self.app_limits: Dict[str, int] = {}
+        self.weights: Dict[str, float] = {}
+        self.in_flight = 0
+        self.app_in_flight: Dict[str, int] = {}
+        self.queues: Dict[str, Dict[str, Deque[Tuple[float, asyncio.Future]]]] = {
+            priority: {} for priority in PRIORITIES
+        }
+        # Start-time fair queuing: every waiter gets a virtual start tag spaced by 1 / weight of its app
+        self.virtual_time: Dict[str, float] = {priority: 0.0 for priority in PRIORITIES}
+        self.last_tags: Dict[Tuple[str, str], float] = {}
+
+    def configure_app(self, app_name: str, concurrency: Optional[int] = None, weight: Optional[float] = None) -> None:
+        self.app_limits.pop(app_name, None)
+        self.weights.pop(app_name, None)
+        if concurrency:
+            self.app_limits[app_name] = concurrency
+        if weight:
+            self.weights[app_name] = weight
+
+    def can_run(self, app_name: str) -> bool:
+        limit = self.app_limits.get(app_name, self.app_concurrency)
+        return self.in_flight < self.concurrency and (not limit or self.app_in_flight.get(app_name, 0) < limit)
+
+    def acquire(self, app_name: str) -> None:
+        self.in_flight += 1
+        self.app_in_flight[app_name] = self.app_in_flight.get(app_name, 0) + 1
+        metrics.set_gauge("abi2api_upstream_in_flight", self.app_in_flight[app_name], app=app_name)
+
+    def release(self, app_name: str) -> None:
+        self.in_flight -= 1
+        self.app_in_flight[app_name] -= 1
+        metrics.set_gauge("abi2api_upstream_in_flight", self.app_in_flight[app_name], app=app_name)
+        self.dispatch()
+
+    def dispatch(self) -> None:
+        while self.in_flight < self.concurrency:
+            best = None
+            for priority in PRIORITIES:
+                for app_name, queue in self.queues[priority].items():
+                    if queue and self.can_run(app_name) and (best is None or queue[0][0] < best[0]):
+                        best = (queue[0][0], app_name, priority)
+                if best is not None:
+                    break
+            if best is None:
+                return
+            tag, app_name, priority = best
+            _, future = self.queues[priority][app_name].popleft()
+            self.virtual_time[priority] = tag
+            self.acquire(app_name)
+            future.set_result(None)
+            self.report_queue(app_name, priority)
+
+    def report_queue(self, app_name: str, priority: str) -> None:
+        metrics.set_gauge("abi2api_upstream_queue_depth", len(self.queues[priority][app_name]),
+                          app=app_name, priority=priority)
+
+    def try_slot(self) -> Optional[Callable[[], None]]:
+        # Takes a free slot without queueing, for extra requests that are only worth sending when there is room.
+        # Returns the function releasing it, or None when no slot is free.
+        app_name, priority = UPSTREAM_CONTEXT.get()
+        if self.queues[priority].get(app_name) or not self.can_run(app_name):
+            return None
+        self.acquire(app_name)
+        return lambda: self.release(app_name)
+
+    @asynccontextmanager
+    async def slot(self):
+        app_name, priority = UPSTREAM_CONTEXT.get()
+        queue = self.queues[priority].setdefault(app_name, deque())
+        if not queue and self.can_run(app_name):
+            self.acquire(app_name)
+        else:
+            started = time.perf_counter()
+            last_tag = self.last_tags.get((priority, app_name), 0.0)
+            tag = max(self.virtual_time[priority], last_tag) + 1 / self.weights.get(app_name, 1)
+            self.last_tags[(priority, app_name)] = tag
+            entry = (tag, asyncio.get_running_loop().create_future())
+            queue.append(entry)
+            self.report_queue(app_name, priority)
+            try:
+                await entry[1]
+            except asyncio.CancelledError:
+                if entry[1].done() and not entry[1].cancelled():
+                    # The slot was granted just before the cancellation, hand it on
+                    self.release(app_name)
+                else:
+                    queue.remove(entry)
+                    self.report_queue(app_name, priority)
+                raise
+            metrics.inc("abi2api_upstream_queued_total", app=app_name, priority=priority)
+            metrics.inc("abi2api_upstream_wait_seconds_total", round(time.perf_counter() - started, 6),
+                        app=app_name, priority=priority)
+        try:
+            yield
+        finally:
+            self.release(app_name)
@@ -0,0 +1,12 @@
+from marshmallow import Schema, fields, EXCLUDE
+
+
+class ABITypeSchema(Schema):
+    class Meta:
+        ordered = True
+        unknown = EXCLUDE
+
+    name = fields.Str(required=True)
+    mutability = fields.Str(required=True)
+    inputs = fields.List(fields.Dict(), required=True)
+    outputs = fields.List(fields.Dict())
@@ -0,0 +1,132 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Hashable, Iterator, Optional, Tuple
+
+
+def to_tuple(value: Any) -> Any:
+    if isinstance(value, list):
+        return tuple(to_tuple(item) for item in value)
+    return value
+
+
+class ResultStore:
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, commit_every: int = 100,
+                 compact_every: int = 1000, max_queued: int = 10000) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.commit_every = commit_every
+        self.compact_every = compact_every
+        # put() only queues the result, a writer thread serializes, inserts, commits and compacts
+        self.queue: queue.Queue = queue.Queue(max_queued)
+        self.dropped = 0
+        self.writer: Optional[threading.Thread] = None
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at)")
+        self.connection.commit()
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.write_loop, name="result-store-writer", daemon=True)
+            self.writer.start()
+        try:
+            self.queue.put_nowait((key, value, ttl, time.time()))
+        except queue.Full:
+            # A stalled disk must not block requests, the result is only missing from the store after a restart
+            self.dropped += 1
+
+    def write_loop(self) -> None:
+        # The writer's own connection is the only one writing while the server runs, so it never waits on a lock
+        connection = sqlite3.connect(self.path)
+        pending = 0
+        writes = 0
+        last_commit = time.monotonic()
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=1)
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                if item:
+                    pending += self.insert(connection, *item)
+                    writes += 1
+                if pending and (pending >= self.commit_every or self.queue.empty()
+                                or time.monotonic() - last_commit > 1):
+                    connection.commit()
+                    pending = 0
+                    last_commit = time.monotonic()
+                if item and writes % self.compact_every == 0:
+                    connection.commit()
+                    pending = 0
+                    self.compact(connection)
+        finally:
+            connection.commit()
+            connection.close()
+
+    @staticmethod
+    def insert(connection: sqlite3.Connection, key: Hashable, value: Any, ttl: Optional[float], now: float) -> int:
+        try:
+            serialized = json.dumps(value)
+        except (TypeError, ValueError):
+            return 0
+        connection.execute(
+            "INSERT OR REPLACE INTO results (key, value, size, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (json.dumps(key), serialized, len(serialized), now, now + ttl if ttl is not None else None)
+        )
+        return 1
+
+    def load(self) -> Iterator[Tuple[Hashable, Any, Optional[float]]]:
+        # Yields (key, value, remaining ttl) for every live entry, remaining ttl is None for immutable results
+        now = time.time()
+        rows = self.connection.execute(
+            "SELECT key, value, expires_at FROM results WHERE expires_at IS NULL OR expires_at > ? "
+            "ORDER BY created_at", (now,)
+        )
+        for key, value, expires_at in rows:
+            yield to_tuple(json.loads(key)), json.loads(value), expires_at - now if expires_at is not None else None
+
+    def total_size(self, connection: Optional[sqlite3.Connection] = None) -> int:
+        connection = connection or self.connection
+        return connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def compact(self, connection: Optional[sqlite3.Connection] = None) -> None:
+        connection = connection or self.connection
+        deleted = connection.execute(
+            "DELETE FROM results WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        ).rowcount
+        total_size = self.total_size(connection)
+        if total_size > self.max_bytes:
+            # Drop the oldest entries until the store is back at 90% of its limit
+            excess = total_size - int(self.max_bytes * 0.9)
+            rows = connection.execute("SELECT key, size FROM results ORDER BY created_at")
+            to_delete = []
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                to_delete.append((key,))
+                excess -= size
+            connection.executemany("DELETE FROM results WHERE key = ?", to_delete)
+            deleted += len(to_delete)
+        connection.commit()
+        if deleted:
+            connection.execute("PRAGMA incremental_vacuum")
+
+    def close(self) -> None:
+        # Waits for the queued results to be written
+        if self.writer is not None:
+            self.queue.put(None)
+            self.writer.join()
+            self.writer = None
+        self.connection.close()
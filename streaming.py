@@ -0,0 +1,79 @@
+import json
+from typing import Any, List
+
+WHITESPACE = b" \t\r\n"
+
+
+class ReturnDataParser:
+    # Incremental parser for vm-values/query responses: the returnData items are pulled out as they arrive,
+    # the rest of the (small) JSON document is kept and parsed at the end
+    KEY = b'"returnData"'
+
+    def __init__(self) -> None:
+        self.head = bytearray()
+        self.buffer = bytearray()
+        self.items: List[str] = []
+        self.state = "search"
+
+    def feed(self, chunk: bytes) -> None:
+        if self.state == "done":
+            self.head += chunk
+            return
+        self.buffer += chunk
+        position = 0
+        while True:
+            if self.state == "search":
+                index = self.buffer.find(self.KEY, position)
+                if index == -1:
+                    # Keep a possible partial key at the end of the buffer for the next chunk
+                    keep = max(position, len(self.buffer) - len(self.KEY) + 1)
+                    self.head += self.buffer[position:keep]
+                    position = keep
+                    break
+                value_start = index + len(self.KEY)
+                while value_start < len(self.buffer) and self.buffer[value_start] in WHITESPACE + b":":
+                    value_start += 1
+                if value_start >= len(self.buffer):
+                    self.head += self.buffer[position:index]
+                    position = index
+                    break
+                if self.buffer[value_start:value_start + 1] != b"[":
+                    # returnData is null
+                    self.state = "done"
+                    self.head += self.buffer[position:]
+                    position = len(self.buffer)
+                    break
+                self.head += self.buffer[position:value_start + 1]
+                position = value_start + 1
+                self.state = "array"
+            elif self.state == "array":
+                while position < len(self.buffer) and self.buffer[position] in WHITESPACE + b",":
+                    position += 1
+                if position >= len(self.buffer):
+                    break
+                if self.buffer[position:position + 1] == b"]":
+                    self.state = "done"
+                    self.head += self.buffer[position:]
+                    position = len(self.buffer)
+                    break
+                end = self.buffer.find(b'"', position + 1)
+                while end != -1 and self.buffer[end - 1:end] == b"\\":
+                    end = self.buffer.find(b'"', end + 1)
+                if end == -1:
+                    break
+                item = bytes(self.buffer[position:end + 1])
+                self.items.append(json.loads(item) if b"\\" in item else item[1:-1].decode("ascii"))
+                position = end + 1
+            else:
+                self.head += self.buffer[position:]
+                position = len(self.buffer)
+                break
+        del self.buffer[:position]
+
+    def result(self) -> Any:
+        response_json = json.loads(bytes(self.head + self.buffer))
+        if self.items or self.state == "done":
+            data = (response_json.get("data") or {}).get("data")
+            if isinstance(data, dict) and isinstance(data.get("returnData"), list):
+                data["returnData"] = self.items
+        return response_json
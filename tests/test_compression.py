@@ -0,0 +1,62 @@
+import asyncio
+import gzip
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import ResponseCompressor, VariantCache
+
+
+def test_cache_is_bounded_by_bytes():
+    cache = VariantCache(max_entries=10, max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    cache.set("c", b"1234")
+    assert list(cache.entries) == ["b", "c"] and cache.size == 8
+
+
+def test_cache_is_bounded_by_entries():
+    cache = VariantCache(max_entries=2, max_bytes=100)
+    for key in "abc":
+        cache.set(key, b"x")
+    assert list(cache.entries) == ["b", "c"] and cache.size == 2
+
+
+def test_get_keeps_recently_used_entries():
+    cache = VariantCache(max_entries=2, max_bytes=100)
+    cache.set("a", b"x")
+    cache.set("b", b"x")
+    assert cache.get("a") == b"x"
+    cache.set("c", b"x")
+    assert cache.get("b") is None and list(cache.entries) == ["a", "c"]
+
+
+def test_replacing_an_entry_updates_the_size():
+    cache = VariantCache(max_entries=10, max_bytes=10)
+    cache.set("a", b"12345678")
+    cache.set("a", b"12")
+    assert len(cache) == 1 and cache.size == 2
+
+
+def test_values_larger_than_the_cache_are_not_kept():
+    cache = VariantCache(max_entries=10, max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"12345678901")
+    assert list(cache.entries) == ["a"] and cache.size == 4
+
+
+def test_disabled_cache_keeps_nothing():
+    cache = VariantCache(max_entries=0)
+    cache.set("a", b"x")
+    assert len(cache) == 0 and cache.size == 0
+
+
+def test_only_reused_bodies_are_cached():
+    compressor = ResponseCompressor()
+    body = b'{"data": "value"}' * 100
+    once = asyncio.run(compressor.compress(body, "gzip"))
+    assert gzip.decompress(once) == body and len(compressor.variants) == 0
+    again = asyncio.run(compressor.compress(body, "gzip", reuse=True))
+    assert gzip.decompress(again) == body and len(compressor.variants) == 1
+    assert asyncio.run(compressor.compress(body, "gzip", reuse=True)) is again
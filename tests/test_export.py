@@ -0,0 +1,47 @@
+import asyncio
+import csv
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import export
+from export import csv_lines
+
+
+async def iterate(rows):
+    for row in rows:
+        yield row
+
+
+def write_csv(rows):
+    async def collect():
+        return "".join([line async for line in csv_lines(iterate(rows))])
+    return asyncio.run(collect())
+
+
+def read_csv(rows):
+    return list(csv.DictReader(io.StringIO(write_csv(rows))))
+
+
+def test_csv_skips_empty_list_before_first_data_row():
+    rows = [
+        {"address": "erd1a", "args": {}, "data": []},
+        {"address": "erd1b", "args": {}, "data": [{"x": 1}]},
+    ]
+    assert read_csv(rows) == [{"address": "erd1b", "data.x": "1", "error": ""}]
+
+
+def test_csv_only_empty_lists_gives_no_output():
+    rows = [{"address": "erd1a", "args": {}, "data": []}]
+    assert read_csv(rows) == []
+
+
+def test_csv_all_rows_failed_has_one_error_column(monkeypatch):
+    # More failed rows than are held back to find the columns
+    monkeypatch.setattr(export, "CSV_HEADER_ROWS", 2)
+    rows = [{"address": f"erd1{i}", "args": {}, "error": "storage decode error", "code": 400} for i in range(3)]
+    lines = write_csv(rows).splitlines()
+    assert lines[0] == "address,error"
+    assert lines[1:] == [f"erd1{i},storage decode error" for i in range(3)]
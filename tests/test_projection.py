@@ -0,0 +1,118 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from TypeParser import ABITypeParser, build_projection
+
+ABI = {
+    "types": {
+        "Offer": {
+            "type": "struct",
+            "fields": [
+                {"name": "id", "type": "u64"},
+                {"name": "token", "type": "TokenIdentifier"},
+                {"name": "items", "type": "List<Item>"},
+                {"name": "price", "type": "BigUint"},
+                {"name": "expires", "type": "Option<u64>"},
+            ],
+        },
+        "Item": {
+            "type": "struct",
+            "fields": [
+                {"name": "nonce", "type": "u64"},
+                {"name": "amount", "type": "BigUint"},
+                {"name": "tags", "type": "List<u32>"},
+            ],
+        },
+    }
+}
+
+
+def u32(value):
+    return value.to_bytes(4, "big")
+
+
+def u64(value):
+    return value.to_bytes(8, "big")
+
+
+def nested(data):
+    return u32(len(data)) + data
+
+
+def big(value):
+    return nested(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+def item(nonce, amount, tags):
+    return u64(nonce) + big(amount) + u32(len(tags)) + b"".join(u32(tag) for tag in tags)
+
+
+def offer(offer_id, items, price, expires=None):
+    return (u64(offer_id) + nested(b"WEGLD-bd4d79") + u32(len(items)) + b"".join(items) + big(price)
+            + (b"\x01" + u64(expires) if expires is not None else b"\x00"))
+
+
+OFFER = offer(7, [item(1, 10 ** 18, [1, 2]), item(2, 5, [])], 123456789, expires=1700000000)
+
+
+def parse(data, response_type="Offer", fields=None):
+    return ABITypeParser(ABI).parse_hex_response(data if isinstance(data, list) else [data], response_type,
+                                                 build_projection(fields) if fields is not None else None)
+
+
+def test_build_projection_nests_paths():
+    assert build_projection("items.amount, price") == {"items": {"amount": None}, "price": None}
+    assert build_projection("items.amount,items.tags") == {"items": {"amount": None, "tags": None}}
+
+
+def test_build_projection_whole_value_wins_over_subpaths():
+    assert build_projection("items,items.amount") == {"items": None}
+    assert build_projection("items.amount,items") == {"items": None}
+
+
+def test_build_projection_without_paths_is_none():
+    assert build_projection("") is None
+    assert build_projection(" , ,") is None
+
+
+def test_full_parse_without_projection():
+    assert parse(OFFER) == {
+        "id": 7,
+        "token": "WEGLD-bd4d79",
+        "items": [{"nonce": 1, "amount": str(10 ** 18), "tags": [1, 2]}, {"nonce": 2, "amount": "5", "tags": []}],
+        "price": "123456789",
+        "expires": 1700000000,
+    }
+
+
+def test_projection_keeps_only_requested_fields():
+    assert parse(OFFER, fields="price") == {"price": "123456789"}
+    assert parse(OFFER, fields="id,expires") == {"id": 7, "expires": 1700000000}
+
+
+def test_projection_skips_variable_length_fields_before_requested_ones():
+    # token, items and their nested lists have to be measured to find price and expires
+    assert parse(OFFER, fields="expires") == {"expires": 1700000000}
+    assert parse(offer(1, [item(3, 4, [5, 6, 7])] * 3, 8), fields="price,expires") == {"price": "8", "expires": None}
+
+
+def test_projection_into_list_items():
+    assert parse(OFFER, fields="items.amount") == {"items": [{"amount": str(10 ** 18)}, {"amount": "5"}]}
+    assert parse(OFFER, fields="items.tags,price") == {"items": [{"tags": [1, 2]}, {"tags": []}], "price": "123456789"}
+
+
+def test_projection_of_whole_nested_value():
+    assert parse(OFFER, fields="items,items.nonce")["items"] == parse(OFFER)["items"]
+
+
+def test_unknown_fields_are_ignored():
+    assert parse(OFFER, fields="missing") == {}
+    assert parse(OFFER, fields="missing,id") == {"id": 7}
+
+
+def test_projection_applies_to_every_returned_value():
+    offers = [offer(1, [], 2), offer(3, [item(4, 5, [6])], 7, expires=8)]
+    assert parse(offers, "variadic<Offer>", fields="id,price") == [{"id": 1, "price": "2"}, {"id": 3, "price": "7"}]
+    assert parse(offers, "variadic<Offer>") == [parse(offers[0]), parse(offers[1])]
@@ -0,0 +1,132 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ratelimit
+from ratelimit import RateLimiter, TokenBucket, client_key
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def frozen_clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return clock
+
+
+def test_bucket_allows_burst_then_waits(monkeypatch):
+    clock = frozen_clock(monkeypatch)
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.take() == 0.5
+    clock.now += 0.5
+    assert bucket.take() == 0
+
+
+def test_bucket_refill_is_capped_at_burst(monkeypatch):
+    clock = frozen_clock(monkeypatch)
+    bucket = TokenBucket(rate=1, burst=2)
+    clock.now += 100
+    assert bucket.take(2) == 0
+    assert bucket.take() == 1
+
+
+def test_cost_above_burst_is_allowed_once_and_leaves_debt(monkeypatch):
+    clock = frozen_clock(monkeypatch)
+    bucket = TokenBucket(rate=1, burst=5)
+    assert bucket.take(20) == 0
+    # 15 tokens of debt that have to be paid back before the next request
+    clock.now += 14
+    assert bucket.take() == 2
+    clock.now += 2
+    assert bucket.take() == 0
+    clock.now += 1
+    assert bucket.take(20) == 4
+    clock.now += 4
+    assert bucket.take(20) == 0
+
+
+def test_cost_above_burst_waits_for_a_full_bucket_not_the_cost(monkeypatch):
+    clock = frozen_clock(monkeypatch)
+    bucket = TokenBucket(rate=1, burst=5)
+    bucket.take(3)
+    assert bucket.take(50) == 3
+
+
+def test_check_returns_retry_after_in_whole_seconds(monkeypatch):
+    frozen_clock(monkeypatch)
+    limiter = RateLimiter({"rate": 0.4, "burst": 1})
+    assert limiter.check("app", "view", "ip:1") == 0
+    # 2.5 seconds until the next token
+    assert limiter.check("app", "view", "ip:1") == 3
+
+
+def test_check_without_any_limit_allows_everything(monkeypatch):
+    frozen_clock(monkeypatch)
+    limiter = RateLimiter()
+    assert all(limiter.check("app", "view", "ip:1", cost=1000) == 0 for _ in range(10))
+    assert not limiter.buckets
+
+
+def test_clients_have_separate_buckets(monkeypatch):
+    frozen_clock(monkeypatch)
+    limiter = RateLimiter({"rate": 1, "burst": 1})
+    assert limiter.check("app", "view", "ip:1") == 0
+    assert limiter.check("app", "view", "ip:1") == 1
+    assert limiter.check("app", "view", "ip:2") == 0
+
+
+def test_app_limit_is_shared_by_endpoints_without_their_own(monkeypatch):
+    frozen_clock(monkeypatch)
+    limiter = RateLimiter({"rate": 100, "burst": 100})
+    limiter.configure_app("app", {"rate": 1, "burst": 2}, {"heavy": {"rate": 1, "burst": 1}})
+    assert limiter.check("app", "a", "ip:1") == 0
+    assert limiter.check("app", "b", "ip:1") == 0
+    assert limiter.check("app", "a", "ip:1") == 1
+    # The endpoint limit has its own bucket, independent of the app one
+    assert limiter.check("app", "heavy", "ip:1") == 0
+    assert limiter.check("app", "heavy", "ip:1") == 1
+    # Other apps keep the default limit
+    assert limiter.check("other", "a", "ip:1") == 0
+
+
+def test_remove_app_drops_its_limits_and_buckets(monkeypatch):
+    frozen_clock(monkeypatch)
+    limiter = RateLimiter()
+    limiter.configure_app("app", {"rate": 1, "burst": 1})
+    limiter.check("app", "view", "ip:1")
+    limiter.remove_app("app")
+    assert not limiter.buckets
+    assert limiter.check("app", "view", "ip:1") == 0
+    assert limiter.check("app", "view", "ip:1") == 0
+
+
+def test_least_recently_used_client_is_evicted(monkeypatch):
+    frozen_clock(monkeypatch)
+    limiter = RateLimiter({"rate": 1, "burst": 1}, max_clients=2)
+    limiter.check("app", "view", "ip:1")
+    limiter.check("app", "view", "ip:2")
+    limiter.check("app", "view", "ip:1")
+    limiter.check("app", "view", "ip:3")
+    assert set(key[2] for key in limiter.buckets) == {"ip:1", "ip:3"}
+
+
+def request(api_key=None, remote_addr="10.0.0.1"):
+    headers = {"X-API-Key": api_key} if api_key else {}
+    return SimpleNamespace(headers=headers, remote_addr=remote_addr)
+
+
+def test_client_key_only_trusts_known_api_keys():
+    assert client_key(request("known"), {"known"}) == "key:known"
+    # Unknown or unconfigured keys fall back to the address, rotating them does not give new buckets
+    assert client_key(request("rotated"), {"known"}) == "ip:10.0.0.1"
+    assert client_key(request("known")) == "ip:10.0.0.1"
+    assert client_key(request()) == "ip:10.0.0.1"
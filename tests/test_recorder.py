@@ -0,0 +1,57 @@
+import asyncio
+import gzip
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recorder import GatewayRecorder, GatewayReplay
+
+QUERY = {"scAddress": "erd1qqqqqqqqqqqqqpgq", "funcName": "getPrice", "args": []}
+BLOCK = {"blockNonce": "100"}
+
+
+def record(path, entries):
+    recorder = GatewayRecorder(str(path))
+    for body, block, answer in entries:
+        recorder.record(body, block, answer, 0.01)
+    recorder.close()
+    assert recorder.dropped == 0
+
+
+def test_replay_returns_recorded_answers_in_order(tmp_path):
+    path = tmp_path / "recording.jsonl.gz"
+    record(path, [(QUERY, None, {"returnData": ["AQ=="]}), (QUERY, None, {"returnData": ["Ag=="]})])
+    replay = GatewayReplay(str(path))
+    answers = [asyncio.run(replay.answer(QUERY, None)) for _ in range(3)]
+    assert answers == [{"returnData": ["AQ=="]}, {"returnData": ["Ag=="]}, {"returnData": ["AQ=="]}]
+
+
+def test_replay_keys_include_the_block(tmp_path):
+    path = tmp_path / "recording.jsonl.gz"
+    record(path, [(QUERY, BLOCK, {"returnData": ["AQ=="]})])
+    replay = GatewayReplay(str(path))
+    assert asyncio.run(replay.answer(QUERY, BLOCK)) == {"returnData": ["AQ=="]}
+    assert asyncio.run(replay.answer(QUERY, None)) is None
+    assert asyncio.run(replay.answer(dict(QUERY, args=["01"]), BLOCK)) is None
+
+
+def test_errors_are_replayed_and_skipped_for_fallback(tmp_path):
+    path = tmp_path / "recording.jsonl.gz"
+    record(path, [(QUERY, None, (502, "Gateway timeout")), (QUERY, None, {"returnData": []})])
+    replay = GatewayReplay(str(path))
+    assert asyncio.run(replay.answer(QUERY, None)) == (502, "Gateway timeout")
+    assert asyncio.run(replay.answer(QUERY, None, successful=True)) == {"returnData": []}
+    record(path, [(QUERY, BLOCK, (502, "Gateway timeout"))])
+    assert GatewayReplay(str(path)).lookup(QUERY, BLOCK, successful=True) is None
+
+
+def test_recordings_are_appended_and_unfinished_lines_skipped(tmp_path):
+    path = tmp_path / "recording.jsonl.gz"
+    record(path, [(QUERY, None, {"returnData": ["AQ=="]})])
+    with gzip.open(path, "at", encoding="utf-8") as file:
+        file.write('{"key": "cut off')
+    record(path, [(QUERY, None, {"returnData": ["Ag=="]})])
+    replay = GatewayReplay(str(path))
+    assert [asyncio.run(replay.answer(QUERY, None)) for _ in range(2)] == [{"returnData": ["AQ=="]},
+                                                                             {"returnData": ["Ag=="]}]
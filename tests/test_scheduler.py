@@ -0,0 +1,133 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import UpstreamScheduler, set_upstream_context
+
+
+async def query(scheduler, app_name, priority, order):
+    set_upstream_context(app_name, priority)
+    async with scheduler.slot():
+        order.append(app_name if priority == "interactive" else f"{app_name}:{priority}")
+
+
+def run_queued(scheduler, waiters):
+    # Fills every slot, queues the waiters in the given order, then frees the slots and returns the run order
+    async def main():
+        order = []
+        set_upstream_context("blocker")
+        releases = [scheduler.try_slot() for _ in range(scheduler.concurrency)]
+        tasks = [asyncio.create_task(query(scheduler, app_name, priority, order)) for app_name, priority in waiters]
+        await asyncio.sleep(0)
+        for release in releases:
+            release()
+        await asyncio.wait_for(asyncio.gather(*tasks), 1)
+        return order
+    return asyncio.run(main())
+
+
+def test_interactive_queries_run_before_bulk():
+    order = run_queued(UpstreamScheduler(concurrency=1), [("a", "bulk"), ("b", "bulk"), ("c", "interactive")])
+    assert order == ["c", "a:bulk", "b:bulk"]
+
+
+def test_apps_take_turns_without_weights():
+    waiters = [("a", "interactive")] * 3 + [("b", "interactive")] * 3
+    assert run_queued(UpstreamScheduler(concurrency=1), waiters) == ["a", "b", "a", "b", "a", "b"]
+
+
+def test_weights_share_slots_in_proportion():
+    scheduler = UpstreamScheduler(concurrency=1)
+    scheduler.configure_app("heavy", weight=2)
+    waiters = [("heavy", "interactive")] * 4 + [("light", "interactive")] * 2
+    assert run_queued(scheduler, waiters) == ["heavy", "heavy", "light", "heavy", "heavy", "light"]
+
+
+def test_configure_app_resets_previous_settings():
+    scheduler = UpstreamScheduler(concurrency=1)
+    scheduler.configure_app("heavy", concurrency=1, weight=2)
+    scheduler.configure_app("heavy")
+    assert scheduler.app_limits == {} and scheduler.weights == {}
+
+
+def test_app_concurrency_limit_does_not_block_other_apps():
+    async def main():
+        scheduler = UpstreamScheduler(concurrency=10)
+        scheduler.configure_app("capped", concurrency=1)
+        order = []
+        set_upstream_context("capped")
+        release = scheduler.try_slot()
+        capped = asyncio.create_task(query(scheduler, "capped", "interactive", order))
+        other = asyncio.create_task(query(scheduler, "other", "interactive", order))
+        await other
+        assert order == ["other"] and not capped.done()
+        release()
+        await asyncio.wait_for(capped, 1)
+        return order, scheduler.in_flight
+    assert asyncio.run(main()) == (["other", "capped"], 0)
+
+
+def test_try_slot_only_takes_free_slots():
+    async def main():
+        scheduler = UpstreamScheduler(concurrency=2)
+        set_upstream_context("app")
+        first = scheduler.try_slot()
+        second = scheduler.try_slot()
+        assert first is not None and second is not None
+        assert scheduler.try_slot() is None
+        first()
+        third = scheduler.try_slot()
+        assert third is not None
+        second()
+        third()
+        return scheduler.in_flight
+    assert asyncio.run(main()) == 0
+
+
+def test_try_slot_does_not_jump_the_queue():
+    async def main():
+        scheduler = UpstreamScheduler(concurrency=1)
+        set_upstream_context("app")
+        release = scheduler.try_slot()
+        waiter = asyncio.create_task(query(scheduler, "app", "interactive", []))
+        await asyncio.sleep(0)
+        # The queued query gets the slot, not an extra request taken meanwhile
+        release()
+        assert scheduler.try_slot() is None
+        await asyncio.wait_for(waiter, 1)
+        return scheduler.in_flight
+    assert asyncio.run(main()) == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        scheduler = UpstreamScheduler(concurrency=1)
+        set_upstream_context("app")
+        release = scheduler.try_slot()
+        waiter = asyncio.create_task(query(scheduler, "app", "interactive", []))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert not scheduler.queues["interactive"]["app"]
+        release()
+        return scheduler.in_flight
+    assert asyncio.run(main()) == 0
+
+
+def test_waiter_cancelled_after_getting_the_slot_hands_it_on():
+    async def main():
+        scheduler = UpstreamScheduler(concurrency=1)
+        order = []
+        set_upstream_context("app")
+        release = scheduler.try_slot()
+        first = asyncio.create_task(query(scheduler, "first", "interactive", order))
+        second = asyncio.create_task(query(scheduler, "second", "interactive", order))
+        await asyncio.sleep(0)
+        # The slot goes to the first waiter, which is cancelled before it gets to run
+        release()
+        first.cancel()
+        await asyncio.wait_for(asyncio.gather(first, second, return_exceptions=True), 1)
+        return first.cancelled(), order, scheduler.in_flight
+    assert asyncio.run(main()) == (True, ["second"], 0)
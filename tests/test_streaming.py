@@ -0,0 +1,70 @@
+import base64
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streaming import ReturnDataParser
+
+ITEMS = [base64.b64encode(bytes(range(i, i + 40))).decode() for i in range(0, 200, 40)] + [""]
+
+
+def gateway_response(return_data, indent=None):
+    return json.dumps({
+        "data": {"data": {"returnData": return_data, "returnCode": "ok", "returnMessage": "", "gasRemaining": 0}},
+        "error": "",
+        "code": "successful",
+    }, indent=indent).encode()
+
+
+def parse(chunks):
+    parser = ReturnDataParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.result()
+
+
+def every_split(body):
+    # The body in two chunks split at each position, and one byte at a time
+    for position in range(len(body) + 1):
+        yield [body[:position], body[position:]]
+    yield [body[i:i + 1] for i in range(len(body))]
+
+
+BODIES = {
+    "items": gateway_response(ITEMS),
+    "indented": gateway_response(ITEMS, indent=2),
+    "empty": gateway_response([]),
+    "null": gateway_response(None),
+    "escaped": gateway_response(ITEMS).replace(b"/", b"\\/"),
+    "error": json.dumps({"data": None, "error": "invalid contract code", "code": "internal_issue"}).encode(),
+}
+
+
+@pytest.mark.parametrize("name", BODIES)
+def test_any_chunking_gives_the_parsed_document(name):
+    body = BODIES[name]
+    expected = json.loads(body)
+    for chunks in every_split(body):
+        assert parse(chunks) == expected
+
+
+def test_items_are_collected_while_streaming():
+    body = gateway_response(ITEMS)
+    split = body.index(ITEMS[2].encode()) + 5
+    parser = ReturnDataParser()
+    parser.feed(body[:split])
+    assert parser.items == ITEMS[:2]
+    # Only the document around returnData is kept, not the items
+    assert ITEMS[0].encode() not in parser.head + parser.buffer
+    parser.feed(body[split:])
+    assert parser.result() == json.loads(body)
+
+
+def test_truncated_body_fails_to_parse():
+    body = gateway_response(ITEMS)
+    with pytest.raises(ValueError):
+        parse([body[:len(body) // 2]])
@@ -0,0 +1,154 @@
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import config
+
+SERVER_TIMING = getattr(config, "SERVER_TIMING", False)
+TRACE_FILE = getattr(config, "TRACE_FILE", None)
+SPAN_HOOKS: List[Callable[["Span"], None]] = []
+CURRENT_TRACE: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+CURRENT_SPAN: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "end", "attributes")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.time_ns()
+        self.end: Optional[int] = None
+        self.attributes = attributes
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.time_ns()) - self.start) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        # Field names follow the OTLP/JSON span encoding so the file can be fed to OpenTelemetry tooling
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [{"key": key, "value": {"stringValue": str(value)}} for key, value in self.attributes.items()]
+        }
+
+
+class Trace:
+    def __init__(self, name: str) -> None:
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.root = Span(name, self.trace_id, None, {})
+
+    def server_timing(self) -> str:
+        durations: Dict[str, float] = {}
+        for finished_span in self.spans:
+            if finished_span.parent_id is not None:
+                durations[finished_span.name] = durations.get(finished_span.name, 0) + finished_span.duration_ms
+        durations["total"] = self.root.duration_ms
+        return ", ".join(f"{name};dur={duration:.2f}" for name, duration in durations.items())
+
+
+class TraceWriter:
+    # The event loop only queues finished spans, a background thread serializes and appends them to one open file
+    def __init__(self, path: str, max_queued: int = 10000) -> None:
+        self.path = path
+        self.queue: queue.Queue = queue.Queue(max_queued)
+        self.dropped = 0
+        self.thread: Optional[threading.Thread] = None
+
+    def write(self, spans: List[Span]) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="trace-writer", daemon=True)
+            self.thread.start()
+        try:
+            self.queue.put_nowait(spans)
+        except queue.Full:
+            # A stalled disk must not block requests, these spans are lost
+            self.dropped += len(spans)
+
+    def run(self) -> None:
+        with open(self.path, "a") as f:
+            while True:
+                spans = self.queue.get()
+                if spans is None:
+                    return
+                for finished_span in spans:
+                    f.write(json.dumps(finished_span.to_otlp()) + "\n")
+                if self.queue.empty():
+                    f.flush()
+
+    def close(self) -> None:
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+TRACE_WRITER = TraceWriter(TRACE_FILE) if TRACE_FILE else None
+
+
+def close_trace_writer() -> None:
+    if TRACE_WRITER is not None:
+        TRACE_WRITER.close()
+
+
+def add_span_hook(hook: Callable[[Span], None]) -> None:
+    SPAN_HOOKS.append(hook)
+
+
+def tracing_enabled() -> bool:
+    return bool(SERVER_TIMING or TRACE_FILE or SPAN_HOOKS)
+
+
+def export_spans(spans: List[Span]) -> None:
+    for hook in SPAN_HOOKS:
+        for finished_span in spans:
+            hook(finished_span)
+    if TRACE_WRITER is not None:
+        TRACE_WRITER.write(spans)
+
+
+@contextmanager
+def request_trace(name: str) -> Iterator[Optional[Trace]]:
+    if not tracing_enabled():
+        yield None
+        return
+    trace = Trace(name)
+    trace_token = CURRENT_TRACE.set(trace)
+    span_token = CURRENT_SPAN.set(trace.root)
+    try:
+        yield trace
+    finally:
+        trace.root.end = time.time_ns()
+        CURRENT_SPAN.reset(span_token)
+        CURRENT_TRACE.reset(trace_token)
+        trace.spans.append(trace.root)
+        export_spans(trace.spans)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    trace = CURRENT_TRACE.get()
+    if trace is None:
+        yield None
+        return
+    parent = CURRENT_SPAN.get()
+    current = Span(name, trace.trace_id, parent.span_id if parent else None, attributes)
+    token = CURRENT_SPAN.set(current)
+    try:
+        yield current
+    finally:
+        current.end = time.time_ns()
+        CURRENT_SPAN.reset(token)
+        trace.spans.append(current)
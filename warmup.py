@@ -0,0 +1,82 @@
+import asyncio
+import time
+from typing import Any, Dict, List
+import config
+from ParseABI import get_session, parse_abi, DECODE_POOL
+from scheduler import set_upstream_context
+
+WARMUP_CONNECTIONS = getattr(config, "WARMUP_CONNECTIONS", 4)
+
+
+class WarmupState:
+    def __init__(self) -> None:
+        self.ready = False
+        self.started_at = None
+        self.finished_at = None
+        self.steps: Dict[str, str] = {}
+        self.task = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "steps": self.steps,
+            "seconds": round((self.finished_at or time.monotonic()) - self.started_at, 3) if self.started_at else None
+        }
+
+
+WARMUP_STATE = WarmupState()
+
+
+async def open_connections(count: int) -> None:
+    # Concurrent requests force the pool to open (and keep alive) that many gateway connections
+    session = get_session()
+
+    async def ping():
+        async with session.get(f"{config.PROXY_URL}/network/config") as response:
+            await response.read()
+
+    await asyncio.gather(*(ping() for _ in range(count)))
+
+
+async def run_step(name: str, step) -> None:
+    try:
+        await step
+        WARMUP_STATE.steps[name] = "ok"
+    except Exception as e:
+        # A failed step is reported but does not keep the service from becoming ready
+        WARMUP_STATE.steps[name] = f"failed: {e}"
+
+
+async def warm_up(apps: List[Dict[str, Any]]) -> None:
+    WARMUP_STATE.started_at = time.monotonic()
+    set_upstream_context(None, "bulk")
+    await run_step("connections", open_connections(WARMUP_CONNECTIONS))
+    await run_step("decode_pool", DECODE_POOL.warm_up())
+    for app in apps:
+        for sc_address, endpoint_name, args in app["views"]:
+            await run_step(f"{app['name']}/{endpoint_name}", check_view(
+                parse_abi(sc_address, endpoint_name, app["endpoints"], app["abi_json"], args)
+            ))
+    WARMUP_STATE.finished_at = time.monotonic()
+    WARMUP_STATE.ready = True
+
+
+async def check_view(query) -> None:
+    code, output = await query
+    if code != 200:
+        raise RuntimeError(output)
+
+
+def start_warm_up(apps: List[Dict[str, Any]]) -> None:
+    WARMUP_STATE.task = asyncio.ensure_future(warm_up(apps))
+
+
+async def stop_warm_up() -> None:
+    # A warm-up still running at shutdown would open a new gateway session after it was closed
+    task = WARMUP_STATE.task
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass